@@ -3,14 +3,47 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import gc
+import math
+import os
+import random
+import tempfile
 import unittest
 
 import isolation
 import game_agent
+import competition_agent
+import learned_eval
+import opening_book
+import self_play
+import tuning
+
+from isolation.endgame import EndgameSolver
+
+try:
+    import batch_eval
+except ImportError:  # NumPy is not installed
+    batch_eval = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from importlib import reload
 
 
+def play_timed(game, time_limit):
+    """Play `game` with the cyclic garbage collector paused: with pytest and
+    NumPy loaded a full collection takes longer than the agents' safety
+    margin, and would make timeouts depend on the order of the tests"""
+    gc.disable()
+    try:
+        return game.play(time_limit=time_limit)
+    finally:
+        gc.enable()
+
+
 class IsolationTest(unittest.TestCase):
     """Unit tests for isolation agents"""
 
@@ -20,6 +53,434 @@ class IsolationTest(unittest.TestCase):
         self.player2 = "Player2"
         self.game = isolation.Board(self.player1, self.player2)
 
+    def test_bitboard_matches_board(self):
+        """BitBoard must reproduce Board move generation over random games"""
+        rng = random.Random(0)
+        for _ in range(20):
+            board = isolation.Board(self.player1, self.player2)
+            bitboard = isolation.BitBoard(self.player1, self.player2)
+            while True:
+                moves = sorted(board.get_legal_moves())
+                self.assertEqual(moves, sorted(bitboard.get_legal_moves()))
+                self.assertEqual(board.to_string(), bitboard.to_string())
+                self.assertEqual(board.hash(), bitboard.hash())
+                self.assertEqual(board.get_state(), bitboard.get_state())
+                for player in (self.player1, self.player2):
+                    self.assertEqual(board.get_player_location(player),
+                                     bitboard.get_player_location(player))
+                    self.assertEqual(board.mobility(player),
+                                     len(board.get_legal_moves(player)))
+                    self.assertEqual(bitboard.mobility(player),
+                                     len(bitboard.get_legal_moves(player)))
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                board.apply_move(move)
+                bitboard = bitboard.forecast_move(move)
+            self.assertTrue(bitboard.is_loser(bitboard.active_player))
+
+    def test_undo_move_restores_state(self):
+        """undo_move must exactly restore the state before apply_move"""
+        rng = random.Random(1)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls(self.player1, self.player2)
+            snapshots = []
+            while game.get_legal_moves():
+                snapshots.append((game.hash(), game.to_string(), game.move_count,
+                                  game.active_player, game.get_state(),
+                                  sorted(game.get_legal_moves(self.player1)),
+                                  sorted(game.get_legal_moves(self.player2))))
+                game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            while snapshots:
+                game.undo_move()
+                self.assertEqual(snapshots.pop(), (game.hash(), game.to_string(),
+                                                   game.move_count,
+                                                   game.active_player,
+                                                   game.get_state(),
+                                                   sorted(game.get_legal_moves(self.player1)),
+                                                   sorted(game.get_legal_moves(self.player2))))
+            self.assertRaises(RuntimeError, game.undo_move)
+
+    def test_zobrist_hash_transpositions(self):
+        """Move orders reaching the same position must hash identically"""
+        game_a = isolation.Board(self.player1, self.player2)
+        game_b = isolation.BitBoard(self.player1, self.player2)
+        for move in [(0, 0), (3, 3), (2, 1), (1, 2)]:
+            game_a.apply_move(move)
+        for move in [(3, 3), (0, 0), (2, 1), (1, 2)]:
+            game_b.apply_move(move)
+        self.assertEqual(game_a.hash(), game_b.hash())
+        game_b.undo_move()
+        game_b.apply_move((1, 1))
+        self.assertNotEqual(game_a.hash(), game_b.hash())
+
+    def test_canonical_hash_is_shared_by_symmetric_positions(self):
+        """Every rotation and reflection of a position must have the same
+        canonical hash, and moves must map back to legal moves"""
+        from isolation.symmetry import symmetries, transform_state
+        rng = random.Random(2)
+        for board_cls, width, height in ((isolation.Board, 7, 7),
+                                         (isolation.BitBoard, 5, 5),
+                                         (isolation.BitBoard, 6, 4)):
+            game = board_cls(self.player1, self.player2, width, height)
+            for _ in range(5):
+                game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            key, sym = game.canonical_hash()
+            state = game.canonical_state()[0]
+            self.assertEqual(len(symmetries(width, height)), 8 if width == height else 4)
+            for perm, _ in symmetries(width, height):
+                image = board_cls(self.player1, self.player2, width, height)
+                image.set_state(transform_state(game.get_state(), perm))
+                image_key, image_sym = image.canonical_hash()
+                self.assertEqual(image_key, key)
+                self.assertEqual(image.canonical_state()[0], state)
+                # moves of the image, mapped to the canonical frame and back
+                # to the original position, are the original's legal moves
+                moves = [game.transform_move(image.transform_move(m, image_sym), sym,
+                                             inverse=True)
+                         for m in image.get_legal_moves()]
+                self.assertEqual(sorted(moves), sorted(game.get_legal_moves()))
+
+    def test_symmetric_transposition_table_search(self):
+        """Keying the transposition table on symmetry classes must not
+        change the value of a fixed-depth search with a symmetric heuristic"""
+        for seed in range(3):
+            scores = []
+            for symmetry in (False, True):
+                player = game_agent.AlphaBetaPlayer(in_place=True, tt_size=2 ** 12,
+                                                    ordering=True, symmetry=symmetry)
+                player.time_left = lambda: float("inf")
+                game = isolation.BitBoard(player, self.player2)
+                rng = random.Random(seed)
+                for _ in range(2):
+                    game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+                for depth in range(1, 5):
+                    move = player.alphabeta(game, depth)
+                    self.assertIn(move, game.get_legal_moves())
+                scores.append(player._root_score)
+            self.assertEqual(scores[0], scores[1])
+
+    def test_simulator_matches_board_rules(self):
+        """Simulated games must be reproducible and follow the Board rules"""
+        from isolation.simulator import GreedyPolicy, RandomPolicy, simulate
+        self.assertEqual(simulate(RandomPolicy(0), RandomPolicy(1), 20),
+                         simulate(RandomPolicy(0), RandomPolicy(1), 20))
+
+        games = []
+        random_policy, greedy_policy = RandomPolicy(3), GreedyPolicy(5, 4, 4)
+
+        def recording(policy):
+            def play(blocked, own_loc, opp_loc, moves):
+                move = policy(blocked, own_loc, opp_loc, moves)
+                games[-1].append((move % 4, move // 4))
+                return move
+            return play
+
+        start = isolation.Board(self.player1, self.player2, 5, 4)
+        start.apply_move((0, 0))
+        for _ in range(10):
+            games.append([])
+            winners, lengths = simulate(recording(random_policy),
+                                        recording(greedy_policy), 1, 5, 4,
+                                        start.get_state())
+            game = start.copy()
+            for move in games[-1]:
+                self.assertIn(move, game.get_legal_moves())
+                game.apply_move(move)
+            self.assertEqual(lengths[0], len(games[-1]))
+            self.assertFalse(game.get_legal_moves())
+            self.assertEqual(winners[0], 0 if game.active_player == self.player2 else 1)
+
+    def test_in_place_search_leaves_board_unchanged(self):
+        """In-place search must restore the board, even after a timeout"""
+        for calls in (50, 5000):
+            player = game_agent.AlphaBetaPlayer(in_place=True)
+            game = isolation.Board(player, self.player2)
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            before = game.to_string(), game.move_count
+            clock = iter(range(calls, -calls, -1))
+            move = player.get_move(game, lambda: next(clock))
+            self.assertIn(move, game.get_legal_moves())
+            self.assertEqual(before, (game.to_string(), game.move_count))
+
+    def test_mcts_reuses_subtree(self):
+        """MCTS must return legal moves and keep the subtree of the reply"""
+        player = competition_agent.MCTSPlayer()
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        clock = iter(range(2000, -2000, -1))
+        move = player.get_move(game, lambda: next(clock))
+        self.assertIn(move, game.get_legal_moves())
+        game.apply_move(move)
+        reply = sorted(game.get_legal_moves())[0]
+        game.apply_move(reply)
+        root = player.find_root(competition_agent.bitboard_state(game))
+        self.assertGreater(root.visits, 0)
+
+        # the center of a 3x3 board has no knight moves: no search at all
+        game = isolation.Board(player, self.player2, width=3, height=3)
+        game.apply_move((1, 1))
+        game.apply_move((0, 0))
+        self.assertEqual(player.get_move(game, lambda: 1 / 0), (-1, -1))
+
+    def test_parallel_player_closes_its_pool(self):
+        """The worker pool must stop when the player leaves a with block"""
+        with game_agent.ParallelAlphaBetaPlayer(workers=1) as player:
+            game = isolation.Board(player, self.player2)
+            clock = iter(range(10 ** 6, 0, -1000))
+            self.assertIn(player.get_move(game, lambda: next(clock)),
+                          game.get_legal_moves())
+            self.assertIsNotNone(player._pool)
+        self.assertIsNone(player._pool)
+
+    def test_pondering_is_notified_and_stopped(self):
+        """Board.play must report every opponent move to a pondering player,
+        whose thread must not outlive the game"""
+        player = game_agent.AlphaBetaPlayer(tt_size=2 ** 12, ordering=True,
+                                            ponder=True, ponder_limit=50)
+        opponent = game_agent.AlphaBetaPlayer(timeout=20.)
+        game = isolation.Board(player, opponent)
+        winner, history, termination = play_timed(game, 50)
+        self.assertNotEqual(termination, "timeout")
+        # the player's final move (if the game ended on the opponent's turn)
+        # is not followed by a reported reply
+        player_moves = (len(history) + 1) // 2
+        self.assertGreaterEqual(player.ponder_hits + player.ponder_misses,
+                                player_moves - 1)
+        player.stop_pondering()
+        self.assertIsNone(player._ponder_thread)
+
+    def test_opening_book_covers_symmetric_positions(self):
+        """Every early position, in any orientation, must get a legal book
+        move, and the book must survive a save/load roundtrip"""
+        book = opening_book.build_book(5, 5, max_ply=2, depth=1,
+                                       score_fn=game_agent.defensive)
+        path = os.path.join(tempfile.mkdtemp(), "book.bin")
+        book.save(path)
+        loaded = opening_book.OpeningBook.load(path)
+        self.assertEqual(book.entries, loaded.entries)
+
+        game = isolation.Board(self.player1, self.player2, 5, 5)
+        for first in game.get_legal_moves():
+            for second in game.forecast_move(first).get_legal_moves():
+                position = game.forecast_move(first).forecast_move(second)
+                move = loaded.lookup(position)
+                self.assertIn(move, position.get_legal_moves())
+        position.apply_move(position.get_legal_moves()[0])
+        self.assertIsNone(loaded.lookup(position))
+
+    def test_endgame_solver_plays_partitioned_positions(self):
+        """AlphaBetaPlayer must hand partitioned positions to the endgame
+        solver and keep the win in positions the solver proves won"""
+        solver = EndgameSolver(7, 7)
+        rng = random.Random(4)
+        found = 0
+        while found < 5:
+            game = isolation.BitBoard(self.player1, self.player2)
+            while game.get_legal_moves() and (game.move_count < 3 or
+                                              solver.regions(game) is None):
+                game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            if not game.get_legal_moves() or not solver.solve(game)[1]:
+                continue
+            found += 1
+
+            player = game_agent.AlphaBetaPlayer(endgame=True)
+            state = game.get_state()
+            if game.move_count % 2 == 0:
+                game = isolation.Board(player, self.player2)
+            else:
+                game = isolation.Board(self.player1, player)
+            game.set_state(state)
+            clock = iter(range(5000, -5000, -1))
+            move = player.get_move(game, lambda: next(clock))
+            self.assertEqual(player.endgame_moves, 1)
+            self.assertFalse(solver.solve(game.forecast_move(move))[1])
+
+    @unittest.skipIf(batch_eval is None, "requires NumPy")
+    def test_batch_eval_matches_scalar(self):
+        """Vectorized heuristics must return exactly the scalar scores of
+        every child, for both players and both board backends"""
+        score_fns = [game_agent.defensive, game_agent.aggressive,
+                     game_agent.center_play, game_agent.defensive_to_aggressive]
+        rng = random.Random(5)
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for _ in range(30):
+                game = board_cls(self.player1, self.player2)
+                for _ in range(rng.randrange(2, 40)):
+                    moves = sorted(game.get_legal_moves())
+                    if not moves:
+                        break
+                    game.apply_move(rng.choice(moves))
+                moves = game.get_legal_moves()
+                if not moves:
+                    continue
+                for score_fn in score_fns:
+                    batch_score = batch_eval.vectorized(score_fn)
+                    for player in (self.player1, self.player2):
+                        expected = [score_fn(game.forecast_move(m), player)
+                                    for m in moves]
+                        self.assertEqual(batch_score(game, moves, player), expected)
+
+    def test_search_telemetry_records_every_move(self):
+        """A player with telemetry must record one consistent entry per move,
+        and the records must be written to the trace file as JSON lines"""
+        path = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+        telemetry = game_agent.SearchTelemetry(path)
+        player = game_agent.AlphaBetaPlayer(tt_size=2 ** 12, telemetry=telemetry)
+        opponent = game_agent.AlphaBetaPlayer()
+        game = isolation.Board(player, opponent)
+        winner, history, termination = play_timed(game, 50)
+        # a final move that loses the game (a forfeit) is not in the history
+        moves = [record["move"] for record in telemetry.records]
+        self.assertEqual(moves[:len(history[::2])], history[::2])
+        self.assertLessEqual(len(moves) - len(history[::2]), 1)
+        for record in telemetry.records:
+            self.assertEqual(len(record["iterations"]), record["depth"])
+            self.assertLessEqual(record["cutoffs"], record["nodes"])
+            self.assertLessEqual(record["tt_hits"], record["tt_probes"])
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), len(telemetry.records))
+        summary = game_agent.SearchTelemetry.summary(telemetry.records)
+        self.assertEqual(summary["moves"], len(telemetry.records))
+
+
+    def test_time_manager_skips_iterations_that_cannot_finish(self):
+        """The time manager must predict the next iteration from the growth
+        of the node counts, and gamble on it only when the best move changed"""
+        for last_move, expected in (((0, 0), False), ((1, 1), True)):
+            clock = [100.]
+            manager = game_agent.TimeManager()
+            manager.start(lambda: clock[0], 10.)
+            for nodes, elapsed, move in ((100, 1., (0, 0)), (300, 3., (0, 0)),
+                                         (900, 9., (0, 0)), (2700, 27., last_move)):
+                self.assertTrue(manager.next_iteration())
+                clock[0] -= elapsed
+                manager.completed(nodes, move)
+            # branching factor 3: the next iteration should take 81 ms, with
+            # 50 ms left before the threshold
+            self.assertAlmostEqual(manager.predicted(), 81.)
+            self.assertEqual(manager.next_iteration(), expected)
+
+    def test_search_clock_samples_timer_before_deadline(self):
+        """A search clock must read the timer far less often than once per
+        node and still stop the search before the timeout threshold"""
+        clock = game_agent.SearchClock()
+        player = game_agent.AlphaBetaPlayer(in_place=True, clock=clock)
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        reads = [0]
+
+        def time_left():
+            # every node takes 0.05 ms
+            reads[0] += 1
+            return 500. - 0.05 * player.nodes
+
+        self.assertIn(player.get_move(game, time_left), game.get_legal_moves())
+        self.assertLess(reads[0], player.nodes / 10)
+        self.assertEqual(clock.interval, 1)
+        self.assertGreater(time_left(), player.TIMER_THRESHOLD - 0.1)
+
+    def test_lost_position_returns_legal_move(self):
+        """A position in which every move scores -inf must still return a
+        legal move rather than (-1, -1), which forfeits the game"""
+        player = game_agent.AlphaBetaPlayer(score_fn=lambda game, player: float("-inf"))
+        game = isolation.Board(player, self.player2)
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        player.time_left = lambda: 1000.
+        self.assertIn(player.alphabeta(game, 2), game.get_legal_moves())
+
+
+    def test_extensions_deepen_low_mobility_lines(self):
+        """Extending every position (any player has at most 8 moves) by a
+        budget of 2 plies must give a depth 1 search the value of a plain
+        depth 3 search, and restore the budget afterwards"""
+        self.assertRaises(ValueError, game_agent.AlphaBetaPlayer, batch=True,
+                          extension_moves=2)
+        scores = []
+        for depth, options in ((3, {}), (1, {"extension_moves": 8,
+                                              "extension_budget": 2})):
+            player = game_agent.AlphaBetaPlayer(in_place=True, **options)
+            player.time_left = lambda: 1000.
+            game = isolation.Board(player, self.player2)
+            for move in [(3, 3), (2, 4), (1, 2), (4, 3)]:
+                game.apply_move(move)
+            self.assertIn(player.alphabeta(game, depth), game.get_legal_moves())
+            scores.append(player._root_score)
+            self.assertEqual(player._extensions_left, player.extension_budget)
+        self.assertEqual(scores[0], scores[1])
+        self.assertGreater(player.extensions, 0)
+
+    def test_self_play_data_roundtrip(self):
+        """Self-play must write every position of its games, with the
+        winner, in a file that reads back to legal positions"""
+        path = os.path.join(tempfile.mkdtemp(), "selfplay.bin")
+        count, terminations = self_play.generate(path, 2, 5, 5, time_limit=10.)
+        width, height, positions = self_play.load_positions(path)
+        self.assertEqual((width, height, len(positions)), (5, 5, count))
+        self.assertGreater(count, 0)
+        for state, winner in positions:
+            game = isolation.BitBoard(self.player1, self.player2, 5, 5)
+            game.set_state(state)
+            self.assertIn(winner, (0, 1))
+            self.assertTrue(game.get_legal_moves())
+
+    @unittest.skipIf(numpy is None, "requires NumPy")
+    def test_learned_eval_plugs_into_search(self):
+        """Learned evaluations must score terminal positions like the other
+        heuristics and serve as the score_fn of a search player"""
+        positions = []
+        for seed in range(20):
+            game = isolation.BitBoard(self.player1, self.player2)
+            rng = random.Random(seed)
+            states = []
+            while game.get_legal_moves():
+                states.append(game.get_state())
+                game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            winner = 1 - game.move_count % 2
+            positions += [(state, winner) for state in states]
+        for kind in ("linear", "mlp"):
+            score_fn, report = learned_eval.train(positions, 7, 7, kind)
+            self.assertLess(report["train"][0], 0.7)
+            path = os.path.join(tempfile.mkdtemp(), "model.json")
+            score_fn.save(path)
+            score_fn = learned_eval.LearnedScore.load(path)
+
+            player = game_agent.AlphaBetaPlayer(score_fn=score_fn)
+            game = isolation.Board(player, self.player2)
+            game.apply_move((3, 3))
+            game.apply_move((2, 4))
+            self.assertTrue(math.isfinite(score_fn(game, player)))
+            clock = iter(range(3000, -3000, -1))
+            self.assertIn(player.get_move(game, lambda: next(clock)),
+                          game.get_legal_moves())
+            while game.get_legal_moves():
+                game.apply_move(sorted(game.get_legal_moves())[0])
+            self.assertEqual(score_fn(game, player), game.utility(player))
+
+
+    def test_sprt_stops_on_clear_results(self):
+        """The SPRT must accept H1 for a clearly stronger candidate and H0
+        for an equal one, and the matches must stop once decided"""
+        rng = random.Random(6)
+        for score, expected in ((0.7, "H1"), (0.5, "H0")):
+            test = tuning.SPRT(elo0=0., elo1=50.)
+            while test.decision() is None:
+                test.add(rng.random() < score)
+            self.assertEqual(test.decision(), expected)
+            estimate, low, high = test.elo()
+            self.assertTrue(low < estimate < high)
+
+        results = tuning.run_matches([tuning.parse_candidate("1,1")],
+                                     tuning.parse_candidate("defensive"),
+                                     elo1=400., max_games=2, time_limit=20.)
+        candidate, opponent, test, terminations = results[0]
+        self.assertEqual((candidate, opponent, test.games), ("1,1", "defensive", 2))
+        self.assertEqual(sum(terminations.values()), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,166 @@
+"""Vectorized versions of the heuristics in `game_agent`.
+
+At a search node one ply above the horizon every child is a leaf, so instead
+of building and scoring each child board in turn, the children are described
+by NumPy arrays -- the blocked-cell bitmask of each child, the cell of the
+player who moved, and the cell of the other player -- and each heuristic is
+computed for all of them at once from bitmask population counts.
+
+Every function here returns exactly the values that the scalar heuristic of
+the same name returns on the child boards (including the +/-inf scores of
+won and lost positions), so a search gives the same results with or without
+batching.  Boards with more than 64 cells, and positions in which the
+player not moving has not been placed yet, are left to the scalar
+heuristics.
+"""
+import numpy as np
+
+from isolation.bitboard import knight_tables
+
+# Number of set bits of every byte value
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+# Knight-move masks (as a list of ints and as a uint64 array) and the row and
+# column of each cell, shared by all boards of the same (width, height)
+_TABLES = {}
+
+
+def batch_tables(width, height):
+    """Return the knight-move masks of a board size as a list of ints and
+    as a uint64 array, and the row and column of every cell index as float
+    arrays. """
+    key = (width, height)
+    if key not in _TABLES:
+        masks, coords = knight_tables(width, height)
+        _TABLES[key] = (masks, np.array(masks, dtype=np.uint64),
+                        np.array([r for r, _ in coords], dtype=np.float64),
+                        np.array([c for _, c in coords], dtype=np.float64))
+    return _TABLES[key]
+
+
+def popcount(values):
+    """Return the number of set bits of each element of a uint64 array. """
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(values):  # noqa: F811 -- native on NumPy >= 2.0
+        """Return the number of set bits of each element of a uint64 array. """
+        return np.bitwise_count(values).astype(np.int64)
+
+
+class Children:
+    """Features of all the children of a position that a heuristic needs,
+    seen from the perspective of one player.
+
+    Only the mobility of the player who moved differs between the children
+    in a way that needs a population count per child: the other player
+    loses at most the one cell the mover took, and every child has one
+    blank cell less than the parent.
+
+    Attributes
+    ----------
+    own_moves, opp_moves : numpy.ndarray
+        The number of legal moves of the player and of its opponent.
+
+    blanks : int
+        The number of blank cells.
+
+    row, col : numpy.ndarray or float
+        The row and column of the player.
+
+    won, lost : numpy.ndarray or bool
+        Boolean masks of the children won or lost by the player.
+    """
+
+    def __init__(self, game, moves, player):
+        width, height = game.width, game.height
+        masks, mask_array, rows, cols = batch_tables(width, height)
+        blocked, p1_loc, p2_loc = game.get_state()
+        other_loc = p2_loc if game.move_count % 2 == 0 else p1_loc
+        free = ((1 << (width * height)) - 1) & ~blocked
+
+        cells = np.array([r + c * height for r, c in moves], dtype=np.int64)
+        # a knight move never returns to its own cell, so the mover's moves
+        # only depend on the parent's blocked cells
+        mover_moves = popcount(mask_array[cells] & np.uint64(free))
+        other_free = masks[other_loc] & free
+        other_moves = (bin(other_free).count("1") -
+                       (np.right_shift(np.uint64(other_free), cells.astype(np.uint64)) &
+                        np.uint64(1)).astype(np.int64))
+        self.blanks = bin(free).count("1") - 1
+
+        # in each child the mover becomes the inactive player, so only the
+        # player not moving can be out of moves (and lose)
+        if player == game.active_player:
+            self.own_moves, self.opp_moves = mover_moves, other_moves
+            self.row, self.col = rows[cells], cols[cells]
+            self.won, self.lost = other_moves == 0, False
+        else:
+            self.own_moves, self.opp_moves = other_moves, mover_moves
+            self.row, self.col = rows[other_loc], cols[other_loc]
+            self.won, self.lost = False, other_moves == 0
+        self.size = len(moves)
+
+    def finish(self, score):
+        """Apply the won and lost scores and return a list of floats. """
+        score = np.broadcast_to(np.asarray(score, dtype=np.float64), (self.size,))
+        score = np.where(self.won, np.inf, score)
+        return np.where(self.lost, -np.inf, score).tolist()
+
+
+def batch_defensive(children, width, height):
+    return children.finish(2 * children.own_moves - children.opp_moves)
+
+
+def batch_aggressive(children, width, height):
+    return children.finish(children.own_moves - 2 * children.opp_moves)
+
+
+def batch_center_play(children, width, height):
+    # same arithmetic, in the same order, as game_agent.distance_from_center
+    center_x, center_y = width / 2, height / 2
+    distance = ((width - center_x) ** 2 + (height - center_y) ** 2 -
+                (children.row - center_x) ** 2 - (children.col - center_y) ** 2) / 2 * 3
+    return children.finish(children.own_moves - children.opp_moves + distance)
+
+
+def batch_defensive_to_aggressive(children, width, height):
+    # game_agent.defensive_to_aggressive returns the number of blank cells
+    return children.finish(children.blanks)
+
+
+BATCH_SCORES = {
+    "defensive": batch_defensive,
+    "aggressive": batch_aggressive,
+    "center_play": batch_center_play,
+    "defensive_to_aggressive": batch_defensive_to_aggressive,
+}
+
+
+class BatchScore:
+    """Evaluate a heuristic on all children of a position: calling it with
+    (game, moves, player) returns the list
+    [score_fn(game.forecast_move(m), player) for m in moves], or None when
+    the position cannot be batched. """
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+
+    def __call__(self, game, moves, player):
+        if (game.width * game.height > 64 or
+                game.get_player_location(game.inactive_player) is None):
+            return None
+        return self.batch_fn(Children(game, moves, player), game.width, game.height)
+
+
+def vectorized(score_fn):
+    """Return a BatchScore for `score_fn`, or None if `score_fn` has no
+    vectorized version. """
+    if getattr(score_fn, "__module__", None) != "game_agent":
+        return None
+    batch_fn = BATCH_SCORES.get(score_fn.__name__)
+    if batch_fn is None:
+        return None
+    return BatchScore(batch_fn)
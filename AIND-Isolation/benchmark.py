@@ -0,0 +1,739 @@
+"""Micro-benchmarks for the Isolation board backends and search agents.
+
+Every benchmark starts from the same seeded random positions so that the
+numbers reported for different backends or agent settings are directly
+comparable.  Run `python benchmark.py -h` for the list of benchmarks.
+"""
+import argparse
+import random
+
+from timeit import default_timer as timer
+
+from isolation import Board, BitBoard
+from isolation.bitboard import knight_tables
+from isolation.endgame import EndgameSolver, popcount
+from isolation.isolation import TIME_LIMIT_MILLIS
+from game_agent import (AlphaBetaPlayer, ParallelAlphaBetaPlayer, SearchClock,
+                        SearchTelemetry, SearchTimeout, TimeManager, aggressive,
+                        center_play, defensive, defensive_to_aggressive)
+
+BACKENDS = [("list", Board), ("bitboard", BitBoard)]
+
+
+def random_position(board_cls, plies, seed, width=7, height=7,
+                    player_1="Player1", player_2="Player2"):
+    """Return a board of the given class after `plies` seeded random moves.
+
+    Moves are drawn from the sorted legal move list so that every backend
+    reaches exactly the same position for the same seed.
+    """
+    rng = random.Random(seed)
+    game = board_cls(player_1, player_2, width=width, height=height)
+    for _ in range(plies):
+        moves = sorted(game.get_legal_moves())
+        if not moves:
+            break
+        game.apply_move(rng.choice(moves))
+    return game
+
+
+def timed_move(player, game, time_limit=TIME_LIMIT_MILLIS):
+    """Ask `player` for a move with the same timer that `Board.play` uses,
+    returning the move and the milliseconds left when it returned. """
+    move_start = 1000 * timer()
+    time_left = lambda: time_limit - (1000 * timer() - move_start)
+    move = player.get_move(game.copy(), time_left)
+    return move, time_left()
+
+
+def perft(game, depth):
+    """Count the leaf nodes of the full game tree below `game` to `depth`. """
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves()
+    if not moves:
+        return 1
+    return sum(perft(game.forecast_move(m), depth - 1) for m in moves)
+
+
+def bench_board(args):
+    """Compare move generation and search speed of the board backends.
+
+    Player 1 is always to move in the start positions (`--plies` should be
+    even), so the fixed-depth alpha-beta search runs from its perspective.
+    """
+    print("{:<10}{:>14}{:>16}".format("Backend", "Perft nodes/s", "Search leaves/s"))
+    for name, board_cls in BACKENDS:
+        leaves = [0]
+
+        def counting_score(game, player):
+            leaves[0] += 1
+            return defensive(game, player)
+
+        player = AlphaBetaPlayer(score_fn=counting_score, in_place=args.in_place)
+        player.time_left = lambda: float("inf")
+        positions = [random_position(board_cls, args.plies, seed, player_1=player)
+                     for seed in range(args.positions)]
+
+        nodes = 0
+        start = timer()
+        for game in positions:
+            nodes += perft(game, args.depth)
+        perft_rate = nodes / (timer() - start)
+
+        start = timer()
+        for game in positions:
+            player.alphabeta(game, args.depth)
+        search_rate = leaves[0] / (timer() - start)
+
+        print("{:<10}{:>14.0f}{:>16.0f}".format(name, perft_rate, search_rate))
+
+
+def bench_movegen(args):
+    """Time `get_legal_moves` for both players on 7x7 and larger boards. """
+    print("{:<8}{:<10}{:>16}".format("Size", "Backend", "Calls/s"))
+    for size in args.sizes:
+        for name, board_cls in BACKENDS:
+            positions = [random_position(board_cls, args.plies, seed, size, size)
+                         for seed in range(args.positions)]
+            calls = 0
+            start = timer()
+            for _ in range(args.repeat):
+                for game in positions:
+                    game.get_legal_moves(game.active_player)
+                    game.get_legal_moves(game.inactive_player)
+                    calls += 2
+            rate = calls / (timer() - start)
+            print("{:<8}{:<10}{:>16.0f}".format("{0}x{0}".format(size), name, rate))
+
+
+def bench_ordering(args):
+    """Report the average iterative deepening depth completed per move under
+    the tournament time limit, with and without move ordering. """
+    configs = [("plain", {}),
+               ("ordering", {"ordering": True}),
+               ("tt", {"tt_size": 2 ** 16}),
+               ("tt+ordering", {"tt_size": 2 ** 16, "ordering": True})]
+    print("{:<14}{:>12}{:>12}".format("Search", "Avg depth", "Max depth"))
+    for name, options in configs:
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=args.in_place, **options)
+        for seed in range(args.positions):
+            game = random_position(BitBoard, args.plies, seed, player_1=player)
+            timed_move(player, game, args.time_limit)
+        depths = player.completed_depths
+        print("{:<14}{:>12.2f}{:>12}".format(name, sum(depths) / len(depths), max(depths)))
+
+
+class CountingPlayer(AlphaBetaPlayer):
+    """AlphaBetaPlayer that totals the nodes and search time of its moves,
+    like the playout counters of MCTSPlayer. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.total_nodes = 0
+        self.search_time = 0.
+
+    def get_move(self, game, time_left):
+        start = time_left()
+        move = super().get_move(game, time_left)
+        self.total_nodes += self.nodes
+        self.search_time += start - time_left()
+        return move
+
+    def nodes_per_second(self):
+        """Average node rate over all moves searched by this player. """
+        return 1000. * self.total_nodes / self.search_time if self.search_time else 0.
+
+
+def bench_mcts(args):
+    """Play MCTSPlayer and AlphaBetaPlayer against the same opponents at the
+    same time limit and report win rates, the MCTS playout rate and the
+    alpha-beta node rate.
+
+    Games always run in this process (`--processes` is ignored) so that the
+    rates are read from the players that searched. """
+    import tournament
+    from competition_agent import MCTSPlayer, custom_score
+    from sample_players import improved_score
+
+    tournament.TIME_LIMIT = args.time_limit
+    mcts = MCTSPlayer()
+    alphabeta = CountingPlayer(score_fn=custom_score)
+    test_agents = [tournament.Agent(mcts, "MCTS"),
+                   tournament.Agent(alphabeta, "AB_Custom")]
+    cpu_agents = [tournament.Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")]
+    tournament.play_matches(cpu_agents, test_agents, args.positions)
+    print("\nMCTS playouts per second: {:.0f}".format(mcts.playouts_per_second()))
+    print("AB_Custom nodes per second: {:.0f}".format(alphabeta.nodes_per_second()))
+
+
+def bench_parallel(args):
+    """Compare the root-splitting parallel player to the serial player: the
+    speedup in time to complete every iteration up to `--depth`, and the
+    depth completed per move at the time limit. """
+    serial = AlphaBetaPlayer(score_fn=defensive, in_place=True)
+    positions = [random_position(BitBoard, args.plies, seed)
+                 for seed in range(args.positions)]
+
+    serial_time = parallel_time = 0.
+    with ParallelAlphaBetaPlayer(score_fn=defensive, workers=args.processes) as parallel:
+        parallel.start()
+        for state in (game.get_state() for game in positions):
+            game = BitBoard(serial, "Player2")
+            game.set_state(state)
+            serial.time_left = lambda: float("inf")
+            start = timer()
+            for depth in range(1, args.depth + 1):
+                serial.alphabeta(game, depth)
+            serial_time += timer() - start
+
+            game = BitBoard(parallel, "Player2")
+            game.set_state(state)
+            moves = game.get_legal_moves()
+            start = timer()
+            for depth in range(1, args.depth + 1):
+                parallel.parallel_root(game, moves, depth, float("inf"))
+            parallel_time += timer() - start
+
+            for player in (serial, parallel):
+                game = BitBoard(player, "Player2")
+                game.set_state(state)
+                timed_move(player, game, args.time_limit)
+
+    print("Workers: {}".format(parallel.workers))
+    print("Speedup to depth {}: {:.2f}x".format(args.depth, serial_time / parallel_time))
+    for name, player in (("serial", serial), ("parallel", parallel)):
+        depths = player.completed_depths
+        print("{:<10} average depth at {:.0f} ms: {:.2f}".format(
+            name, args.time_limit, sum(depths) / len(depths)))
+
+
+def bench_ponder(args):
+    """Play AlphaBetaPlayer with and without pondering against the same
+    opponent and report win rates and the ponder hit rate.
+
+    Games run in this process unless `--processes` is given, in which case
+    the ponder counters stay in the workers and are not reported.  In this
+    process the ponder thread shares the interpreter with the opponent, so
+    the benchmark understates the gain over an opponent in another process.
+    """
+    import tournament
+    from sample_players import improved_score
+
+    tournament.TIME_LIMIT = args.time_limit
+    ponder = AlphaBetaPlayer(score_fn=defensive, in_place=True, tt_size=2 ** 16,
+                             ordering=True, ponder=True)
+    test_agents = [tournament.Agent(AlphaBetaPlayer(score_fn=defensive, in_place=True,
+                                                    tt_size=2 ** 16, ordering=True),
+                                    "AB_TT"),
+                   tournament.Agent(ponder, "AB_Ponder")]
+    cpu_agents = [tournament.Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")]
+    tournament.play_matches(cpu_agents, test_agents, args.positions, args.processes)
+    predicted = ponder.ponder_hits + ponder.ponder_misses
+    if predicted:
+        print("\nPonder hit rate: {:.1f}% of {} predicted replies".format(
+            100. * ponder.ponder_hits / predicted, predicted))
+
+
+def partitioned_position(seed, width=7, height=7, min_region=4):
+    """Play seeded random moves until the players' regions separate and
+    return the board, or None if the game ends first or either region has
+    fewer than `min_region` cells when they separate. """
+    rng = random.Random(seed)
+    game = BitBoard("Player1", "Player2", width, height)
+    solver = EndgameSolver(width, height)
+    while True:
+        moves = sorted(game.get_legal_moves())
+        if not moves:
+            return None
+        regions = solver.regions(game) if game.move_count > 2 else None
+        if regions is not None:
+            if min(popcount(regions[1]), popcount(regions[3])) < min_region:
+                return None
+            return game
+        game.apply_move(rng.choice(moves))
+
+
+def bench_endgame(args):
+    """Time the exact endgame solver on random partitioned positions and
+    count how often a time-limited alpha-beta search, without the solver,
+    still picks a winning move in the positions the solver proves won.
+
+    The solver gets the same time limit as the search; positions it cannot
+    solve in time are reported and skipped.
+    """
+    positions = [game for game in (partitioned_position(seed)
+                                   for seed in range(args.positions)) if game]
+    solve_times = []
+    won = correct = timeouts = unsolved = 0
+    for game in positions:
+        start = timer()
+
+        def check():
+            if 1000 * (timer() - start) > args.time_limit:
+                raise SearchTimeout()
+
+        solver = EndgameSolver(game.width, game.height, check=check)
+        try:
+            _, wins = solver.solve(game)
+        except SearchTimeout:
+            unsolved += 1
+            continue
+        solve_times.append(1000 * (timer() - start))
+        if not wins:
+            continue
+        won += 1
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=True,
+                                 tt_size=2 ** 16, ordering=True)
+        state = game.get_state()
+        game = BitBoard(player, "Player2") if game.move_count % 2 == 0 \
+            else BitBoard("Player1", player)
+        game.set_state(state)
+        move, ms_left = timed_move(player, game, args.time_limit)
+        timeouts += ms_left < 0
+        if move in game.get_legal_moves():
+            solver.check = None
+            correct += not solver.solve(game.forecast_move(move))[1]
+
+    print("Partitioned positions: {} ({} won for the player to move, "
+          "{} not solved in {:.0f} ms)".format(len(positions), won, unsolved,
+                                               args.time_limit))
+    print("Solver time: {:.2f} ms average, {:.2f} ms max".format(
+        sum(solve_times) / len(solve_times), max(solve_times)))
+    print("Alpha-beta at {:.0f} ms: {} / {} winning moves, {} timeouts".format(
+        args.time_limit, correct, won, timeouts))
+
+
+def bench_batch(args):
+    """Compare scalar and vectorized (NumPy) scoring of the children of a
+    node: leaves scored per second for each heuristic, and the time of a
+    fixed-depth search with and without batching at the frontier. """
+    from batch_eval import vectorized
+
+    print("{:<10}{:<26}{:>12}{:>12}{:>10}".format(
+        "Backend", "Heuristic", "Scalar/s", "Batch/s", "Speedup"))
+    for name, board_cls in BACKENDS:
+        positions = [random_position(board_cls, args.plies, seed)
+                     for seed in range(args.positions)]
+        for score_fn in (defensive, aggressive, center_play, defensive_to_aggressive):
+            batch_score = vectorized(score_fn)
+            leaves = 0
+            start = timer()
+            for _ in range(args.repeat):
+                for game in positions:
+                    moves = game.get_legal_moves()
+                    player = game.active_player
+                    [score_fn(game.forecast_move(move), player) for move in moves]
+                    leaves += len(moves)
+            scalar_rate = leaves / (timer() - start)
+            start = timer()
+            for _ in range(args.repeat):
+                for game in positions:
+                    batch_score(game, game.get_legal_moves(), game.active_player)
+            batch_rate = leaves / (timer() - start)
+            print("{:<10}{:<26}{:>12.0f}{:>12.0f}{:>9.2f}x".format(
+                name, score_fn.__name__, scalar_rate, batch_rate,
+                batch_rate / scalar_rate))
+
+    states = [game.get_state() for game in positions]
+    for name, board_cls in BACKENDS:
+        times = []
+        for batch in (False, True):
+            player = AlphaBetaPlayer(score_fn=defensive, in_place=args.in_place,
+                                     batch=batch)
+            player.time_left = lambda: float("inf")
+            start = timer()
+            for state in states:
+                game = board_cls(player, "Player2")
+                game.set_state(state)
+                player.alphabeta(game, args.depth)
+            times.append(timer() - start)
+        print("Depth {} search on {}: {:.2f} s scalar, {:.2f} s batched ({:.2f}x)".format(
+            args.depth, name, times[0], times[1], times[0] / times[1]))
+
+
+def bench_clock(args):
+    """Search the same positions under `--time-limit` with the timer read at
+    every node and as scheduled by a SearchClock, and report the timer
+    reads and nodes per move, the time spent reading the timer (reads times
+    the cost of one read of the `Board.play` timer, measured separately)
+    and the smallest time margin, which must stay positive. """
+    move_start = 1000 * timer()
+    time_left = lambda: args.time_limit - (1000 * timer() - move_start)
+    start = timer()
+    for _ in range(args.repeat):
+        time_left()
+    read_ms = 1000 * (timer() - start) / args.repeat
+    print("One timer read: {:.3f} us\n".format(1000 * read_ms))
+
+    print("{:<10}{:>12}{:>12}{:>14}{:>12}{:>14}".format(
+        "Timer", "Reads/move", "Nodes/move", "Nodes/read", "Reads (ms)",
+        "Min margin"))
+    for name, clock in [("per node", None), ("sampled", SearchClock())]:
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=True, tt_size=2 ** 16,
+                                 ordering=True, clock=clock)
+        nodes, reads, margins = 0, 0, []
+        for seed in range(args.positions):
+            game = random_position(BitBoard, args.plies, seed, player_1=player)
+            samples = clock.samples if clock is not None else 0
+            margins.append(timed_move(player, game, args.time_limit)[1])
+            nodes += player.nodes
+            reads += clock.samples - samples if clock is not None else player.nodes
+        print("{:<10}{:>12.0f}{:>12.0f}{:>14.1f}{:>12.2f}{:>14.2f}".format(
+            name, reads / args.positions, nodes / args.positions, nodes / reads,
+            reads * read_ms / args.positions, min(margins)))
+
+
+def bench_telemetry(args):
+    """Compare the nodes searched per move under the tournament time limit
+    with telemetry disabled and enabled, and print the telemetry summary.
+    The node counter runs in both cases, so the difference is the cost of
+    building the per-move records. """
+    print("{:<12}{:>12}{:>12}{:>14}".format("Telemetry", "Nodes/move", "Avg depth",
+                                            "Margin (ms)"))
+    for name, telemetry in [("disabled", None), ("enabled", SearchTelemetry())]:
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=args.in_place,
+                                 tt_size=2 ** 16, telemetry=telemetry)
+        nodes, margins = 0, []
+        for seed in range(args.positions):
+            game = random_position(BitBoard, args.plies, seed, player_1=player)
+            margins.append(timed_move(player, game, args.time_limit)[1])
+            nodes += player.nodes
+        depths = player.completed_depths
+        print("{:<12}{:>12.0f}{:>12.2f}{:>14.2f}".format(
+            name, nodes / args.positions, sum(depths) / len(depths),
+            sum(margins) / len(margins)))
+    summary = SearchTelemetry.summary(telemetry.records)
+    print("\n" + ", ".join("{} {}".format(k, round(v, 3)) for k, v in summary.items()))
+
+
+def bench_timing(args):
+    """Play games under `--time-limit` with and without the adaptive time
+    manager against the same opponent, and report per move the average
+    depth, the milliseconds spent in the aborted last iteration, and the
+    time margin, together with the games lost on time or by forfeit. """
+    from sample_players import improved_score
+
+    print("{:<10}{:>7}{:>7}{:>10}{:>13}{:>13}{:>10}{:>9}".format(
+        "Timing", "Games", "Moves", "Depth", "Wasted (ms)", "Margin (ms)",
+        "Timeouts", "Forfeits"))
+    for name, manager in [("timeout", None), ("adaptive", TimeManager())]:
+        telemetry = SearchTelemetry()
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=args.in_place,
+                                 tt_size=2 ** 16, ordering=True, telemetry=telemetry,
+                                 time_manager=manager)
+        opponent = AlphaBetaPlayer(score_fn=improved_score)
+        lost = {"timeout": 0, "forfeit": 0}
+        for seed in range(args.positions):
+            # play each opening from both seats
+            for first in (player, opponent):
+                game = random_position(Board, 2, seed, player_1=first,
+                                       player_2=opponent if first is player else player)
+                winner, _, termination = game.play(time_limit=args.time_limit)
+                if winner is opponent and termination in lost:
+                    lost[termination] += 1
+        records = telemetry.records
+        wasted = [args.time_limit - r["margin"] - sum(r["iterations"])
+                  for r in records if not r["endgame"]]
+        summary = SearchTelemetry.summary(records)
+        print("{:<10}{:>7}{:>7}{:>10.2f}{:>13.2f}{:>13.2f}{:>10}{:>9}".format(
+            name, 2 * args.positions, summary["moves"], summary["depth"],
+            sum(wasted) / len(wasted), summary["margin"], lost["timeout"],
+            lost["forfeit"]))
+
+
+def bench_learned(args):
+    """Time a learned evaluation (`--model`, written by learned_eval.py)
+    against the hand-written heuristics on random positions, then play it
+    against `defensive` from both seats of each opening, with the same
+    search settings and `--time-limit`. """
+    from learned_eval import LearnedScore
+
+    learned = LearnedScore.load(args.model)
+    positions = [random_position(BitBoard, plies, seed, player_1="p1", player_2="p2")
+                 for seed in range(args.positions) for plies in range(2, 30, 3)]
+    positions = [game for game in positions if game.get_legal_moves()]
+    print("{:<24}{:>14}".format("Evaluation", "us/call"))
+    for name, score_fn in [("defensive", defensive),
+                           ("center_play", center_play),
+                           ("learned ({})".format(learned.kind), learned)]:
+        start = timer()
+        for _ in range(max(1, args.repeat // 100)):
+            for game in positions:
+                score_fn(game, "p1")
+        calls = max(1, args.repeat // 100) * len(positions)
+        print("{:<24}{:>14.2f}".format(name, 1e6 * (timer() - start) / calls))
+
+    player = AlphaBetaPlayer(score_fn=learned, in_place=True, tt_size=2 ** 16,
+                             ordering=True)
+    opponent = AlphaBetaPlayer(score_fn=defensive, in_place=True, tt_size=2 ** 16,
+                               ordering=True)
+    wins = 0
+    for seed in range(args.positions):
+        for first, second in ((player, opponent), (opponent, player)):
+            game = random_position(BitBoard, 2, seed, player_1=first, player_2=second)
+            winner, _, _ = game.play(time_limit=args.time_limit)
+            wins += winner is player
+    print("\nlearned vs defensive: {} of {} games won ({:.1f}%)".format(
+        wins, 2 * args.positions, 50. * wins / args.positions))
+
+
+def bench_scaling(args):
+    """Search the same kind of positions on every board size of `--sizes`
+    (5x5 to 15x15 with, e.g., `--sizes 5 7 9 11 13 15`) under
+    `--time-limit` and report, per backend, the search rate, the average
+    iterative deepening depth, and the peak memory allocated during a move.
+
+    Memory is measured in a separate pass with tracemalloc, whose
+    bookkeeping would otherwise slow down the timed searches.
+    """
+    import tracemalloc
+
+    print("{:<8}{:<10}{:>12}{:>12}{:>16}".format("Size", "Backend", "Nodes/s",
+                                                 "Avg depth", "Peak KiB/move"))
+    for size in args.sizes:
+        for name, board_cls in BACKENDS:
+            player = AlphaBetaPlayer(score_fn=defensive, in_place=True,
+                                     tt_size=2 ** 16, ordering=True)
+            positions = [random_position(board_cls, args.plies, seed, size, size,
+                                         player_1=player)
+                         for seed in range(args.positions)]
+            nodes, elapsed = 0, 0.
+            for game in positions:
+                _, margin = timed_move(player, game, args.time_limit)
+                nodes += player.nodes
+                elapsed += (args.time_limit - margin) / 1000.
+            depths = player.completed_depths
+
+            peaks = []
+            for game in positions:
+                tracemalloc.start()
+                timed_move(player, game, args.time_limit)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            print("{:<8}{:<10}{:>12.0f}{:>12.2f}{:>16.1f}".format(
+                "{0}x{0}".format(size), name, nodes / elapsed,
+                sum(depths) / len(depths), sum(peaks) / len(peaks) / 1024.))
+
+
+def bench_symmetry(args):
+    """Search the same positions under `--time-limit` with the transposition
+    table keyed on exact positions and on symmetry classes, and report the
+    table hit rate, the average depth and the nodes searched per move.
+    Symmetric transpositions are most common in the opening, so use a small
+    `--plies`. """
+    print("{:<10}{:>10}{:>12}{:>12}".format("TT key", "Hit rate", "Avg depth",
+                                          "Nodes/move"))
+    for name, symmetry in [("exact", False), ("symmetry", True)]:
+        player = AlphaBetaPlayer(score_fn=defensive, in_place=True, tt_size=2 ** 16,
+                                 ordering=True, symmetry=symmetry)
+        nodes = 0
+        for seed in range(args.positions):
+            game = random_position(BitBoard, args.plies, seed, player_1=player)
+            timed_move(player, game, args.time_limit)
+            nodes += player.nodes
+        depths = player.completed_depths
+        print("{:<10}{:>10.3f}{:>12.2f}{:>12.0f}".format(
+            name, player.tt.hit_rate(), sum(depths) / len(depths),
+            nodes / args.positions))
+
+
+def bench_simulate(args):
+    """Compare the games per second of `Board.play` between two
+    RandomPlayers with the headless simulator between random and greedy
+    policies, over `--positions` x 100 games. """
+    from isolation.simulator import GreedyPolicy, RandomPolicy, simulate
+    from sample_players import RandomPlayer
+
+    games = 100 * args.positions
+    print("{:<22}{:>10}{:>12}{:>14}".format("Games", "Games/s", "Speedup",
+                                            "P1 win rate"))
+    start = timer()
+    wins = 0
+    for _ in range(games):
+        player_1 = RandomPlayer()
+        winner, _, _ = Board(player_1, RandomPlayer()).play()
+        wins += winner is player_1
+    baseline = games / (timer() - start)
+    print("{:<22}{:>10.0f}{:>12}{:>14.3f}".format("Board.play random", baseline,
+                                                  "1.0x", wins / games))
+    for name, policies in [
+            ("simulate random", (RandomPolicy(0), RandomPolicy(1))),
+            ("simulate greedy", (GreedyPolicy(7, 7, 0), RandomPolicy(1)))]:
+        start = timer()
+        winners, _ = simulate(policies[0], policies[1], games)
+        rate = games / (timer() - start)
+        print("{:<22}{:>10.0f}{:>12}{:>14.3f}".format(
+            name, rate, "{:.1f}x".format(rate / baseline),
+            1. - sum(winners) / games))
+
+
+def wins(blocked, own, opp, masks, memo):
+    """Return True if the player to move at cell `own` wins the position
+    with the blocked cells `blocked` against the opponent at cell `opp`,
+    searching the game to the end. """
+    key = (blocked, own, opp)
+    result = memo.get(key)
+    if result is None:
+        free = masks[own] & ~blocked
+        result = False
+        while free:
+            low = free & -free
+            free ^= low
+            if not wins(blocked | low, opp, low.bit_length() - 1, masks, memo):
+                result = True
+                break
+        memo[key] = result
+    return result
+
+
+def tactical_positions(count, max_seeds=1000):
+    """Return up to `count` states (see Board.get_state()) with player 1 to
+    move in which it has both winning and losing moves, along with its
+    winning moves, found by solving each candidate to the end of the game.
+
+    Candidates are reached by seeded random openings continued by a depth
+    3 search of both players, to between 14 and 24 plies, so that they
+    resemble the middle games of real matches.
+    """
+    masks = knight_tables(7, 7)[0]
+    searcher = AlphaBetaPlayer(in_place=True)
+    searcher.time_left = lambda: float("inf")
+    positions = []
+    for seed in range(max_seeds):
+        if len(positions) == count:
+            break
+        game = random_position(BitBoard, 4, seed, player_1=searcher, player_2=searcher)
+        while game.move_count < 14 + 2 * (seed % 6) and game.get_legal_moves():
+            game.apply_move(searcher.alphabeta(game, 3))
+        moves = game.get_legal_moves()
+        if game.move_count % 2 or not moves:
+            continue
+        blocked, p1_loc, p2_loc = game.get_state()
+        memo = {}
+        winning = [m for m in moves
+                   if not wins(blocked | 1 << (m[0] + 7 * m[1]), p2_loc,
+                               m[0] + 7 * m[1], masks, memo)]
+        if winning and len(winning) < len(moves):
+            positions.append((game.get_state(), set(winning)))
+    return positions
+
+
+def bench_tactics(args):
+    """Search `--positions` solved middle game positions, in which the
+    player to move can win but some of its moves lose, under
+    `--time-limit` with and without low-mobility extensions, and report
+    how often a winning move is played. """
+    import sys
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    configs = [("no extensions", {}),
+               ("ext <=1 move", {"extension_moves": 1}),
+               ("ext <=2 moves", {"extension_moves": 2}),
+               ("ext <=2 budget 4", {"extension_moves": 2, "extension_budget": 4}),
+               ("ext <=3 moves", {"extension_moves": 3})]
+    players = [AlphaBetaPlayer(score_fn=defensive, in_place=True, tt_size=2 ** 16,
+                               ordering=True, **options) for _, options in configs]
+    positions = tactical_positions(args.positions)
+    print("{} tactical positions\n".format(len(positions)))
+    print("{:<20}{:>10}{:>12}{:>12}{:>14}".format("Search", "Accuracy", "Avg depth",
+                                                  "Nodes/move", "Ext/move"))
+    for (name, _), player in zip(configs, players):
+        correct = nodes = extensions = 0
+        for state, winning in positions:
+            game = BitBoard(player, "Player2")
+            game.set_state(state)
+            move, _ = timed_move(player, game, args.time_limit)
+            correct += move in winning
+            nodes += player.nodes
+            extensions += player.extensions
+        depths = player.completed_depths
+        print("{:<20}{:>10.3f}{:>12.2f}{:>12.0f}{:>14.0f}".format(
+            name, correct / len(positions), sum(depths) / len(depths),
+            nodes / len(positions), extensions / len(positions)))
+
+
+def recomputed_defensive(game, player):
+    """game_agent.defensive with every mobility recomputed from the legal
+    move lists, as the heuristics did before boards cached them. """
+    if player == game.active_player and not game.get_legal_moves(game.active_player):
+        return float("-inf")
+    if player == game.inactive_player and not game.get_legal_moves(game.active_player):
+        return float("inf")
+    own_moves = len(game.get_legal_moves(player))
+    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    return float(2 * own_moves - opp_moves)
+
+
+def bench_mobility(args):
+    """Compare leaf evaluation with mobilities read from the board's cached
+    counts (`defensive`) and recomputed from the legal move lists, in
+    microseconds per call and in a fixed `--depth` in-place search. """
+    print("{:<10}{:<12}{:>10}{:>16}".format("Backend", "Mobility", "us/leaf",
+                                            "Search nodes/s"))
+    for name, board_cls in BACKENDS:
+        for label, score_fn in [("recomputed", recomputed_defensive),
+                                ("cached", defensive)]:
+            player = AlphaBetaPlayer(score_fn=score_fn, in_place=True)
+            player.time_left = lambda: float("inf")
+            positions = [random_position(board_cls, plies, seed, player_1=player)
+                         for seed in range(args.positions) for plies in (4, 12, 20)]
+            positions = [game for game in positions if game.get_legal_moves()]
+            start = timer()
+            for _ in range(max(1, args.repeat // 10)):
+                for game in positions:
+                    score_fn(game, player)
+            leaf = 1e6 * (timer() - start) / (max(1, args.repeat // 10) * len(positions))
+
+            start = timer()
+            for game in positions:
+                player.alphabeta(game, args.depth)
+            rate = player.nodes / (timer() - start)
+            print("{:<10}{:<12}{:>10.2f}{:>16.0f}".format(name, label, leaf, rate))
+
+
+BENCHMARKS = {
+    "batch": bench_batch,
+    "board": bench_board,
+    "clock": bench_clock,
+    "endgame": bench_endgame,
+    "learned": bench_learned,
+    "mobility": bench_mobility,
+    "movegen": bench_movegen,
+    "ordering": bench_ordering,
+    "mcts": bench_mcts,
+    "parallel": bench_parallel,
+    "ponder": bench_ponder,
+    "scaling": bench_scaling,
+    "simulate": bench_simulate,
+    "symmetry": bench_symmetry,
+    "tactics": bench_tactics,
+    "telemetry": bench_telemetry,
+    "timing": bench_timing,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Isolation benchmarks.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help="The benchmark to run.")
+    parser.add_argument("--positions", type=int, default=20,
+                        help="Number of random start positions.")
+    parser.add_argument("--plies", type=int, default=6,
+                        help="Random plies played to reach each position.")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="Search depth used by the benchmark.")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT_MILLIS,
+                        help="Milliseconds per move for timed benchmarks.")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes for benchmarks that play games.")
+    parser.add_argument("--in-place", action="store_true",
+                        help="Search with apply_move/undo_move instead of copies.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[7, 9, 11, 15],
+                        help="Board sizes (width = height) to benchmark.")
+    parser.add_argument("--repeat", type=int, default=1000,
+                        help="Repetitions of timed micro-benchmark loops.")
+    parser.add_argument("--model", default="learned_eval.json",
+                        help="Learned evaluation model for the learned benchmark.")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
@@ -4,7 +4,20 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import math
+import os
 import random
+import threading
+import time
+import timeit
+
+from isolation.bitboard import knight_tables
+from game_agent import AlphaBetaPlayer, PONDER_DELAY, aggressive
+from opening_book import OpeningBook
+
+# Opening book consulted by CustomPlayer when no other book is given
+OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "opening_book.bin")
 
 
 class SearchTimeout(Exception):
@@ -33,10 +46,239 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    return aggressive(game, player)
+
+
+def bitboard_state(game):
+    """Return the (blocked, active location, inactive location) integer
+    state of a game, where blocked is a bitmask of occupied cell indices and
+    a location of -1 means the player has not moved yet.
+    """
+    blocked, p1_loc, p2_loc = game.get_state()
+    if game.move_count % 2:
+        p1_loc, p2_loc = p2_loc, p1_loc
+    return (blocked, -1 if p1_loc is None else p1_loc,
+            -1 if p2_loc is None else p2_loc)
+
+
+def random_playout(state, masks, full, rand=random.random):
+    """Play uniformly random moves from `state` until a player is stuck.
+
+    Returns
+    -------
+    int
+        0 if the player to move in `state` loses the playout, 1 if the
+        opponent loses.
+    """
+    blocked, loc, opp = state
+    turn = 0
+    while True:
+        free = (masks[loc] if loc >= 0 else full) & ~blocked
+        if not free:
+            return turn
+        bits = []
+        while free:
+            low = free & -free
+            bits.append(low)
+            free ^= low
+        low = bits[int(rand() * len(bits))]
+        blocked |= low
+        loc, opp = opp, low.bit_length() - 1
+        turn ^= 1
+
+
+class MCTSNode:
+    """A node of the Monte Carlo search tree.
+
+    `wins` counts playout wins for the player who made `move`, i.e. the
+    player who is *not* to move in `state`.  Nodes keep no parent pointer,
+    so discarded subtrees are freed by reference counting rather than by
+    cyclic garbage collection pauses in the middle of a timed search.
+    """
+    __slots__ = ("state", "move", "children", "untried", "visits", "wins")
+
+    def __init__(self, state, move=None):
+        self.state = state
+        self.move = move
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.
+
+
+class MCTSPlayer:
+    """Game-playing agent that chooses a move with Monte Carlo tree search
+    using the UCT selection rule and uniformly random playouts.
 
+    The search tree is kept between moves: when the position after the
+    opponent's reply is already in the tree, that subtree becomes the new
+    root and its statistics are reused.
 
-class CustomPlayer:
+    Parameters
+    ----------
+    exploration : float (optional)
+        The UCT exploration constant.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted.
+
+    ponder : bool (optional)
+        If True, keep growing the tree below the chosen move in a background
+        thread while the opponent thinks, until opponent_moved() is called
+        or `ponder_limit` milliseconds pass. The subtree of the opponent's
+        actual reply is then reused as usual.
+
+    ponder_limit : float (optional)
+        Maximum milliseconds spent pondering a single move.
+    """
+
+    def __init__(self, exploration=math.sqrt(2), timeout=10., ponder=False,
+                 ponder_limit=1000.):
+        self.exploration = exploration
+        self.time_left = None
+        self.TIMER_THRESHOLD = timeout
+        self.playouts = 0
+        self.search_time = 0.
+        self._root = None
+        self.ponder = ponder
+        self.ponder_limit = ponder_limit
+        self.ponder_playouts = 0
+        self._ponder_thread = None
+        self._ponder_stop = None
+
+    def __getstate__(self):
+        # the ponder thread and the current timer cannot be pickled
+        state = self.__dict__.copy()
+        state["_ponder_thread"] = None
+        state["_ponder_stop"] = None
+        state["time_left"] = None
+        return state
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.stop_pondering()
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            self._root = None
+            return (-1, -1)
+        self.time_left = time_left
+        start = time_left()
+        masks, coords = knight_tables(game.width, game.height)
+        full = (1 << (game.width * game.height)) - 1
+        root = self.find_root(bitboard_state(game))
+
+        while self.time_left() > self.TIMER_THRESHOLD:
+            self.iterate(root, masks, full)
+            self.playouts += 1
+
+        self.search_time += start - time_left()
+        if not root.children:
+            # timed out before the first iteration
+            self._root = None
+            return legal_moves[0]
+        best = max(root.children, key=lambda c: c.visits)
+        self._root = best
+        if self.ponder:
+            self._ponder_stop = threading.Event()
+            self._ponder_thread = threading.Thread(
+                target=self.ponder_search, args=(best, masks, full, self._ponder_stop))
+            self._ponder_thread.daemon = True
+            self._ponder_thread.start()
+        return coords[best.move]
+
+    def ponder_search(self, root, masks, full, stop):
+        """Run MCTS iterations on `root` until `stop` is set or the ponder
+        limit expires. Runs in the ponder thread. """
+        stop.wait(PONDER_DELAY)
+        deadline = timeit.default_timer() + self.ponder_limit / 1000.
+        while not stop.is_set() and timeit.default_timer() < deadline:
+            self.iterate(root, masks, full)
+            self.ponder_playouts += 1
+            time.sleep(0)  # yield the GIL to a search in this process
+
+    def stop_pondering(self):
+        """Stop the ponder thread, if any, and wait for it to exit. """
+        if self._ponder_thread is not None:
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+    def opponent_moved(self, move):
+        """Notification from `Board.play` that the opponent played `move`;
+        stops pondering. """
+        self.stop_pondering()
+
+    def find_root(self, state):
+        """Return the subtree for `state` kept from the previous move, or a
+        new root node if the position was not explored. """
+        if self._root is not None:
+            for child in self._root.children:
+                if child.state == state:
+                    return child
+        return MCTSNode(state)
+
+    def iterate(self, root, masks, full):
+        """Run one selection, expansion, playout and backup step. """
+        node = root
+        path = [root]
+        exploration = self.exploration
+
+        # selection: descend through fully expanded nodes by UCT
+        while node.untried is not None and not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda c: c.wins / c.visits +
+                       exploration * math.sqrt(log_visits / c.visits))
+            path.append(node)
+
+        # expansion: add one unexplored child
+        if node.untried is None:
+            blocked, loc, _ = node.state
+            free = (masks[loc] if loc >= 0 else full) & ~blocked
+            node.untried = []
+            while free:
+                low = free & -free
+                node.untried.append(low.bit_length() - 1)
+                free ^= low
+        if node.untried:
+            idx = node.untried.pop(random.randrange(len(node.untried)))
+            blocked, loc, opp = node.state
+            node = MCTSNode((blocked | 1 << idx, opp, idx), idx)
+            path[-1].children.append(node)
+            path.append(node)
+
+        # simulation and backup: a win for the player who moved into `node`
+        # when the player to move in `node` loses the playout
+        result = 1. if random_playout(node.state, masks, full) == 0 else 0.
+        for node in reversed(path):
+            node.visits += 1
+            node.wins += result
+            result = 1. - result
+
+    def playouts_per_second(self):
+        """Average playout rate over all moves searched by this player. """
+        return 1000. * self.playouts / self.search_time if self.search_time else 0.
+
+
+class CustomPlayer(AlphaBetaPlayer):
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
@@ -52,19 +294,39 @@ class CustomPlayer:
     Parameters
     ----------
     data : string
-        The name of the search method to use in get_move().
+        The name of the search method to use in get_move(): "mcts" (the
+        default) or "alphabeta".
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    ponder : bool (optional)
+        If True, keep searching during the opponent's turn (see
+        AlphaBetaPlayer and MCTSPlayer). Off by default: the background
+        thread competes for the CPU with an opponent in the same process.
+
+    book : `opening_book.OpeningBook` or str (optional)
+        An opening book, or the path of a book file, consulted before
+        searching. Defaults to OPENING_BOOK if that file exists; pass False
+        to play without a book.
     """
 
-    def __init__(self, data=None, timeout=1.):
-        self.score = custom_score
-        self.time_left = None
-        self.TIMER_THRESHOLD = timeout
+    def __init__(self, data=None, timeout=1., ponder=False, book=None):
+        super().__init__(score_fn=custom_score, timeout=timeout, in_place=True,
+                         tt_size=2 ** 16, ordering=True, endgame=True)
+        self.method = data or "mcts"
+        if self.method not in ("mcts", "alphabeta"):
+            raise ValueError("Unknown search method: {}".format(self.method))
+        self.ponder = ponder and self.method == "alphabeta"
+        self.mcts = MCTSPlayer(timeout=timeout, ponder=ponder and self.method == "mcts")
+        if book is None and os.path.exists(OPENING_BOOK):
+            book = OPENING_BOOK
+        if isinstance(book, str):
+            book = OpeningBook.load(book)
+        self.book = book or None
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +355,21 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        if self.book is not None:
+            move = self.book.lookup(game)
+            if move is not None and move in game.get_legal_moves():
+                return move
+        if self.method == "mcts":
+            move = self.solve_endgame(game)
+            if move is not None:
+                return move
+            return self.mcts.get_move(game, time_left)
+        return super().get_move(game, time_left)
+
+    def opponent_moved(self, move):
+        """Forward the opponent's move to the active search method. """
+        if self.method == "mcts":
+            self.mcts.opponent_moved(move)
+        else:
+            super().opponent_moved(move)
@@ -2,9 +2,17 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import json
+import multiprocessing
+import os
 import random
+import threading
+import time
+import timeit
 from random import randint
 
+from isolation.endgame import EndgameSolver
+
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
@@ -43,8 +51,8 @@ def defensive(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
     score = float(2*own_moves - opp_moves)
 
     return score
@@ -59,8 +67,8 @@ def aggressive(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
     score = float(own_moves - 2*opp_moves)
 
     return score
@@ -87,8 +95,8 @@ def center_play(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
     final_score = own_moves - opp_moves + distance_from_center(game,game.get_player_location(player))
     
     return float(final_score)
@@ -108,16 +116,305 @@ def defensive_to_aggressive(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
 
-    #the number of blank spaces is the inverse of game length
-    num_blanks = len(game.get_blank_spaces())
+    #the number of blank spaces is the inverse of game length (every move
+    #blocks one cell, so it follows from the move count)
+    num_blanks = game.width * game.height - game.move_count
 
     final_score = own_moves * num_blanks/3 + opp_moves * 3/max(1,num_blanks)
 
     return float(num_blanks)
 
+# Transposition table bound types: the stored value is exact, a lower bound
+# (the search failed high) or an upper bound (the search failed low)
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+# Mixed into the Zobrist key when the searching player is player 2, because
+# stored scores are relative to the searching player
+SEAT_KEY = 0x9E3779B97F4A7C15
+
+# Seconds a ponder thread sleeps before searching; see ponder_search()
+PONDER_DELAY = 0.002
+
+
+class TranspositionTable:
+    """Fixed-size cache of alpha-beta search results keyed by Zobrist hash.
+
+    Each slot holds one entry (key, depth, bound type, value, best move,
+    generation).  A colliding store replaces the resident entry when that
+    entry comes from an earlier search (see new_search()) or was searched to
+    a depth no greater than the new one, so deep results from the current
+    move survive while stale entries are recycled.
+
+    Parameters
+    ----------
+    size : int
+        Number of slots, rounded up to a power of two.
+    """
+    def __init__(self, size=2 ** 16):
+        self.size = 1 << max(0, int(size) - 1).bit_length()
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the probe, hit, cutoff and store counters. """
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        """Mark all resident entries as belonging to an earlier search. """
+        self.generation += 1
+
+    def probe(self, key, depth, alpha, beta):
+        """Return a stored value that settles the node searched to `depth`
+        within the (alpha, beta) window, or None if the search must go on.
+        """
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is None or entry[0] != key:
+            return None
+        self.hits += 1
+        _, entry_depth, flag, value, _, _ = entry
+        if entry_depth >= depth and (flag == TT_EXACT or
+                                     (flag == TT_LOWER and value >= beta) or
+                                     (flag == TT_UPPER and value <= alpha)):
+            self.cutoffs += 1
+            return value
+        return None
+
+    def best_move(self, key):
+        """Return the best move stored for the position, or None. """
+        entry = self.entries[key & self.mask]
+        if entry is None or entry[0] != key:
+            return None
+        return entry[4]
+
+    def store(self, key, depth, flag, value, move):
+        """Record a search result, subject to the replacement policy. """
+        slot = key & self.mask
+        entry = self.entries[slot]
+        if entry is not None and entry[0] != key:
+            if entry[5] == self.generation and entry[1] > depth:
+                return
+            self.replacements += 1
+        self.stores += 1
+        self.entries[slot] = (key, depth, flag, value, move, self.generation)
+
+    def add_stats(self, stats):
+        """Add counters gathered elsewhere (e.g., by a copy of this table in
+        a worker process) to the counters of this table. """
+        self.probes += stats["probes"]
+        self.hits += stats["hits"]
+        self.cutoffs += stats["cutoffs"]
+        self.stores += stats["stores"]
+        self.replacements += stats["replacements"]
+
+    def hit_rate(self):
+        """Fraction of probes that found an entry for the probed position. """
+        return self.hits / self.probes if self.probes else 0.
+
+    def stats(self):
+        """Return the hit-rate counters as a dictionary. """
+        return {"probes": self.probes, "hits": self.hits,
+                "cutoffs": self.cutoffs, "stores": self.stores,
+                "replacements": self.replacements,
+                "hit_rate": self.hit_rate()}
+
+
+class SearchTelemetry:
+    """Per-move search statistics of a player, kept in memory and optionally
+    appended to a JSON-lines file.
+
+    Each record is a dict with the move number ("ply"), the move returned
+    ("move", None for (-1, -1)), the number of legal moves ("legal"), the
+    nodes visited, beta cutoffs and low-mobility extensions of the search
+    ("nodes", "cutoffs", "extensions"), the deepest completed iteration
+    ("depth"), the milliseconds spent in each completed iteration
+    ("iterations"), the transposition table probes and hits ("tt_probes",
+    "tt_hits"), the milliseconds left on the clock when get_move() returned
+    ("margin"), and whether the endgame solver chose the move ("endgame").
+
+    Parameters
+    ----------
+    path : str (optional)
+        A file to which every record is appended as one line of JSON.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+
+    def record(self, record):
+        """Add the record of one move. """
+        self.records.append(record)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def summary(records):
+        """Aggregate a list of records into a dictionary: the number of
+        moves, the average nodes, depth and time margin per move, the
+        smallest margin, the moves returned after the deadline ("late"),
+        the moves that returned no move while legal moves remained
+        ("no_move"), and the transposition table hit rate. """
+        moves = len(records)
+        if not moves:
+            return {"moves": 0}
+        probes = sum(r["tt_probes"] for r in records)
+        return {"moves": moves,
+                "nodes": sum(r["nodes"] for r in records) / moves,
+                "depth": sum(r["depth"] for r in records) / moves,
+                "margin": sum(r["margin"] for r in records) / moves,
+                "min_margin": min(r["margin"] for r in records),
+                "late": sum(r["margin"] < 0 for r in records),
+                "no_move": sum(r["move"] is None and r["legal"] > 0 for r in records),
+                "tt_hit_rate": sum(r["tt_hits"] for r in records) / probes if probes else 0.}
+
+
+class TimeManager:
+    """Decide before each iterative deepening iteration whether to start it.
+
+    An iteration that runs out of time is thrown away, so the time manager
+    predicts the cost of the next iteration and stops the search when that
+    cost does not fit in the time remaining.  The prediction multiplies the
+    time of the last completed iteration by the effective branching factor:
+    the geometric mean growth of the node counts over the last two
+    iterations (alpha-beta alternates between cheaper and dearer depths),
+    or the factor carried over from earlier moves while there are fewer
+    than three iterations.
+
+    When the best move changed in the last iteration the position is
+    critical, and the search starts the next iteration as long as
+    `unstable_factor` times the predicted cost fits: resolving the move is
+    worth the risk of losing a partial iteration.
+
+    Parameters
+    ----------
+    unstable_factor : float (optional)
+        The fraction of the predicted cost that has to fit in the remaining
+        time for an iteration to start after the best move changed.
+
+    min_branching : float (optional)
+        The smallest effective branching factor used in the prediction; the
+        transposition table can make an iteration cheaper than the last.
+    """
+    def __init__(self, unstable_factor=0.5, min_branching=1.):
+        self.unstable_factor = unstable_factor
+        self.min_branching = min_branching
+        self.branching = 3.
+        self.started = 0
+        self.skipped = 0
+
+    def start(self, time_left, threshold):
+        """Start timing a move; `time_left` is the move's timer and the
+        search must stop `threshold` milliseconds before it runs out. """
+        self.time_left = time_left
+        self.threshold = threshold
+        self._clock = time_left()
+        self._nodes = []
+        self._times = []
+        self._moves = []
+
+    def completed(self, nodes, move):
+        """Record an iteration that searched `nodes` nodes and chose `move`. """
+        now = self.time_left()
+        self._times.append(self._clock - now)
+        self._clock = now
+        self._nodes.append(max(nodes, 1))
+        self._moves.append(move)
+        if len(self._nodes) >= 3:
+            ratio = (self._nodes[-1] / self._nodes[-3]) ** 0.5
+            self.branching = max(ratio, self.min_branching)
+
+    def predicted(self):
+        """Return the predicted milliseconds of the next iteration. """
+        return self._times[-1] * self.branching if self._times else 0.
+
+    def unstable(self):
+        """Return True if the best move changed in the last iteration. """
+        return len(self._moves) >= 2 and self._moves[-1] != self._moves[-2]
+
+    def next_iteration(self):
+        """Return True if the next iteration is expected to finish in time
+        (or, in an unstable position, has a fair chance to). """
+        remaining = self.time_left() - self.threshold
+        cost = self.predicted()
+        if self.unstable():
+            cost *= self.unstable_factor
+        if cost > remaining:
+            self.skipped += 1
+            return False
+        self.started += 1
+        return True
+
+
+class SearchClock:
+    """Read the search timer every few nodes instead of at every node.
+
+    Each read of `time_left` calls into the timer closure of `Board.play`,
+    which reads the system clock and does some float arithmetic, a
+    noticeable share of the cost of a node.  The clock measures the node
+    rate between two reads and spaces the next read so that it is expected
+    after at most `fraction` of the time left before the search must stop,
+    and after at most `max_gap` milliseconds.  Far from the deadline the
+    timer is read once every few dozen nodes; close to it, at every node.
+    The search therefore still stops before `TIMER_THRESHOLD` unless the
+    node rate suddenly drops by more than a factor of 1 / `fraction`.
+
+    Parameters
+    ----------
+    fraction : float (optional)
+        The largest fraction of the time left before the deadline that may
+        pass between two reads.
+
+    max_gap : float (optional)
+        The largest number of milliseconds between two reads.
+
+    max_interval : int (optional)
+        The largest number of nodes between two reads.
+    """
+    def __init__(self, fraction=0.25, max_gap=1., max_interval=256):
+        self.fraction = fraction
+        self.max_gap = max_gap
+        self.max_interval = max_interval
+        self.rate = None
+        self.interval = 1
+        self.samples = 0
+        self._last = None
+
+    def start(self):
+        """Forget the last read before the node counter or the timer
+        change; the measured node rate is kept. """
+        self._last = None
+
+    def next_sample(self, nodes, slack):
+        """Record a read of the timer after `nodes` nodes, `slack`
+        milliseconds before the search must stop, and return the node count
+        at which to read it next. """
+        self.samples += 1
+        if self._last is not None:
+            last_nodes, last_slack = self._last
+            elapsed = last_slack - slack
+            if elapsed > 0:
+                self.rate = (nodes - last_nodes) / elapsed
+        self._last = (nodes, slack)
+        if self.rate is None:
+            interval = 1
+        else:
+            interval = int(self.rate * min(self.fraction * slack, self.max_gap))
+        # grow the interval gradually, so that a burst of cheap nodes cannot
+        # stretch it across a slow part of the tree
+        self.interval = max(1, min(interval, 2 * self.interval, self.max_interval))
+        return nodes + self.interval
+
+
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
     constructed or tested directly.
@@ -151,7 +448,18 @@ class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    in_place : bool (optional)
+        If True, search by applying and undoing moves on the board passed to
+        get_move() instead of allocating a new board with forecast_move() at
+        every node.
     """
+    def __init__(self, search_depth=3, score_fn=defensive, timeout=10.,
+                 in_place=False):
+        super().__init__(search_depth, score_fn, timeout)
+        self.in_place = in_place
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -265,8 +573,15 @@ class MinimaxPlayer(IsolationPlayer):
             return self.score(game, self), (-1, -1)
 
         for move in possible_moves: #iterate over all possible moves
-            next_position = game.forecast_move(move)
-            score, _move = self.minimax_execute(next_position, depth - 1)
+            if self.in_place:
+                game.apply_move(move)
+                try:
+                    score, _move = self.minimax_execute(game, depth - 1)
+                finally:
+                    game.undo_move()
+            else:
+                next_position = game.forecast_move(move)
+                score, _move = self.minimax_execute(next_position, depth - 1)
 
             if game.active_player == self:
                 if score >= best_score:
@@ -289,7 +604,142 @@ class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    in_place : bool (optional)
+        If True, search by applying and undoing moves on the board passed to
+        get_move() instead of allocating a new board with forecast_move() at
+        every node.
+
+    tt_size : int (optional)
+        Number of transposition table slots shared across the iterative
+        deepening iterations and moves of this player; 0 disables the table.
+
+    symmetry : bool (optional)
+        If True, key the transposition table on `Board.canonical_hash()`,
+        so that positions that are rotations or reflections of each other
+        share entries; stored moves are mapped through the symmetry. The
+        shared scores are exact only for evaluation functions that are
+        invariant under the board symmetries (e.g., the mobility
+        heuristics, but not the center distance on odd-sized boards).
+
+    ordering : bool (optional)
+        If True, order moves at every node using the principal variation of
+        the previous iterative deepening iteration, killer moves and the
+        history heuristic, all carried across iterations of the same move.
+
+    ponder : bool (optional)
+        If True, keep searching in a background thread while the opponent
+        thinks: after each move the player predicts the opponent's reply and
+        searches the resulting position, filling the transposition table.
+        The thread is stopped by opponent_moved(), which `Board.play` calls
+        with the opponent's move. Requires a transposition table.
+
+    ponder_limit : float (optional)
+        Maximum milliseconds spent pondering a single move, in case the
+        opponent's move is never reported.
+
+    endgame : bool (optional)
+        If True, play positions in which the players can no longer reach a
+        common cell with the exact endgame solver instead of searching. The
+        solver may use up to half of the time left for the move; if it
+        does not finish, the move is searched as usual.
+
+    batch : bool (optional)
+        If True, score all children of the nodes one ply above the search
+        horizon at once with the vectorized version of `score_fn` from
+        `batch_eval` (requires NumPy). The scores, and so the moves chosen,
+        are the same as with `score_fn` alone.
+
+    telemetry : `SearchTelemetry` (optional)
+        If given, a record of the search is added to it after every move.
+        The node and cutoff counters of the last move are always available
+        as the `nodes` and `cutoffs` attributes.
+
+    time_manager : `TimeManager` (optional)
+        If given, iterative deepening stops as soon as the next iteration
+        is not expected to finish before the timeout, instead of searching
+        until the timeout fires.
+
+    extension_moves : int (optional)
+        If positive, positions in which either player has at most this many
+        legal moves are searched one ply deeper than their nominal depth;
+        at the horizon this is a quiescence search, which resolves
+        positions where a player is about to be trapped instead of scoring
+        them. 0 disables extensions.
+
+    extension_budget : int (optional)
+        Maximum number of plies by which any line is extended, which bounds
+        the extra work per iteration.
+
+    clock : `SearchClock` (optional)
+        If given, the timer is read every few nodes, as scheduled by the
+        clock, instead of at every node.
     """
+    def __init__(self, search_depth=3, score_fn=defensive, timeout=10.,
+                 in_place=False, tt_size=0, ordering=False, ponder=False,
+                 ponder_limit=1000., endgame=False, batch=False, telemetry=None,
+                 time_manager=None, symmetry=False, extension_moves=0,
+                 extension_budget=2, clock=None):
+        super().__init__(search_depth, score_fn, timeout)
+        if ponder and not tt_size:
+            raise ValueError("Pondering requires a transposition table (tt_size > 0).")
+        if batch and extension_moves:
+            raise ValueError("Batch scoring skips the extensions of leaf nodes; "
+                             "use one or the other.")
+        self.in_place = in_place
+        self.tt = TranspositionTable(tt_size) if tt_size else None
+        self._tt_seat = 0
+        self.symmetry = symmetry
+        self.ordering = ordering
+        self.completed_depths = []
+        self._root_ply = 0
+        self._root_score = 0.
+        self._pv = {}
+        self._pv_line = []
+        self._pv_keys = []
+        self._killers = {}
+        self._history = ({}, {})
+        self.ponder = ponder
+        self.ponder_limit = ponder_limit
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self._ponder_thread = None
+        self._ponder_stop = None
+        self._ponder_reply = None
+        self._ponder_key = None
+        self._ponder_move = None
+        self.endgame = endgame
+        self.endgame_moves = 0
+        self._solver = None
+        self._batch_score = None
+        if batch:
+            from batch_eval import vectorized
+            self._batch_score = vectorized(score_fn)
+            if self._batch_score is None:
+                raise ValueError("There is no vectorized version of {}.".format(
+                    getattr(score_fn, "__name__", score_fn)))
+        self.telemetry = telemetry
+        self.time_manager = time_manager
+        self.extension_moves = extension_moves
+        self.extension_budget = extension_budget
+        self._extensions_left = 0
+        self.clock = clock
+        self._next_check = 0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.extensions = 0
+
+    def __getstate__(self):
+        # the ponder thread and the current timer cannot be pickled
+        state = self.__dict__.copy()
+        state["_ponder_thread"] = None
+        state["_ponder_stop"] = None
+        state["_solver"] = None
+        state["time_left"] = None
+        return state
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -320,24 +770,197 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.stop_pondering()
         self.time_left = time_left
+        if self.tt is not None:
+            self.tt.new_search()
+        self.new_move_ordering()
+        self.nodes = self.cutoffs = self.extensions = 0
+        telemetry = self.telemetry
+        if telemetry is not None:
+            iterations = []
+            clock = time_left()
+            tt_stats = self.tt.stats() if self.tt is not None else None
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
-        best_move = (-1, -1)
+        legal_moves = game.get_legal_moves()
+        best_move = legal_moves[0] if legal_moves else (-1, -1)
+        if self._ponder_move is not None and self._ponder_key == game.hash():
+            best_move = self._ponder_move
+        self._ponder_move = None
+        completed_depth = 0
+
+        if self.endgame:
+            move = self.solve_endgame(game)
+            if move is not None:
+                if telemetry is not None:
+                    self.record_move(game, move, 0, [], tt_stats, True)
+                return move
+
+        manager = self.time_manager
+        if manager is not None:
+            manager.start(time_left, self.TIMER_THRESHOLD)
 
         #implementation of iterative deepening
         try:
-            #iterate through all possible depths in the game until time runs out
-            for depth in range(1, game.width * game.height):
+            #iterate through all possible depths in the game until time runs
+            #out; the game cannot last more moves than there are blank cells
+            for depth in range(1, game.width * game.height - game.move_count + 1):
+                if manager is not None and not manager.next_iteration():
+                    break
+                nodes = self.nodes
                 best_move = self.alphabeta(game, depth)
+                completed_depth = depth
+                if manager is not None:
+                    manager.completed(self.nodes - nodes, best_move)
+                if self.ordering:
+                    self.save_principal_variation(game)
+                if telemetry is not None:
+                    now = time_left()
+                    iterations.append(round(clock - now, 3))
+                    clock = now
+                if self.solved():
+                    break
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
+        self.completed_depths.append(completed_depth)
+        if telemetry is not None:
+            self.record_move(game, best_move, completed_depth, iterations, tt_stats, False)
+
+        if self.ponder and best_move != (-1, -1):
+            self.start_pondering(game, best_move)
+
         # Return the best move from the last completed search iteration
         return best_move
 
+    def record_move(self, game, move, depth, iterations, tt_stats, endgame):
+        """Add the telemetry record of the move being returned; `tt_stats`
+        are the table counters from the start of the move. """
+        if tt_stats is not None:
+            tt_probes = self.tt.probes - tt_stats["probes"]
+            tt_hits = self.tt.hits - tt_stats["hits"]
+        else:
+            tt_probes = tt_hits = 0
+        self.telemetry.record({
+            "ply": game.move_count,
+            "move": list(move) if move != (-1, -1) else None,
+            "legal": len(game.get_legal_moves()),
+            "nodes": self.nodes,
+            "cutoffs": self.cutoffs,
+            "extensions": self.extensions,
+            "depth": depth,
+            "iterations": iterations,
+            "tt_probes": tt_probes,
+            "tt_hits": tt_hits,
+            "margin": round(self.time_left(), 3),
+            "endgame": endgame,
+        })
+
+    def solve_endgame(self, game):
+        """Return the exact best move of a partitioned position, or None if
+        the position is not partitioned or the solver ran out of its share
+        of the time (its memo keeps the work done for later moves).
+        """
+        if (self._solver is None or self._solver.width != game.width or
+                self._solver.height != game.height):
+            self._solver = EndgameSolver(game.width, game.height)
+        reserve = max(self.TIMER_THRESHOLD, self.time_left() / 2)
+
+        def check():
+            if self.time_left() < reserve:
+                raise SearchTimeout()
+
+        self._solver.check = check
+        try:
+            solved = self._solver.solve(game)
+        except SearchTimeout:
+            return None
+        if solved is None:
+            return None
+        self.endgame_moves += 1
+        return solved[0]
+
+    def start_pondering(self, game, move):
+        """Start a background search of the position expected after `move`
+        and the opponent's most likely reply: the transposition table move
+        of the opponent's position if there is one, else any legal reply.
+        """
+        position = game.forecast_move(move)
+        replies = position.get_legal_moves()
+        if not replies:
+            return
+        reply = self.tt_move(position, *self.tt_key(position))
+        if reply not in replies:
+            reply = replies[0]
+        position.apply_move(reply)
+
+        self._ponder_reply = reply
+        self._ponder_key = position.hash()
+        self._ponder_stop = threading.Event()
+        self._ponder_thread = threading.Thread(
+            target=self.ponder_search, args=(position, self._ponder_stop))
+        self._ponder_thread.daemon = True
+        self._ponder_thread.start()
+
+    def ponder_search(self, game, stop):
+        """Run iterative deepening on `game` until `stop` is set or the
+        ponder limit expires, keeping the best move of the deepest completed
+        iteration. Runs in the ponder thread. """
+        # yield the interpreter until get_move() has returned and the move
+        # has been timed, so that starting the thread costs no search time
+        stop.wait(PONDER_DELAY)
+        deadline = timeit.default_timer() + self.ponder_limit / 1000.
+
+        def time_left():
+            # the timer is checked at every node (every few nodes with a
+            # clock): releasing the GIL here keeps an opponent searching in
+            # the same process from waiting on this thread for a whole
+            # interpreter switch interval
+            time.sleep(0)
+            if stop.is_set():
+                return float("-inf")
+            return 1000 * (deadline - timeit.default_timer())
+
+        self.time_left = time_left
+        self.tt.new_search()
+        self.new_move_ordering()
+        try:
+            for depth in range(1, game.width * game.height - game.move_count + 1):
+                self._ponder_move = self.alphabeta(game, depth)
+                if self.ordering:
+                    self.save_principal_variation(game)
+                if self.solved():
+                    break
+        except SearchTimeout:
+            pass
+
+    def stop_pondering(self):
+        """Stop the ponder thread, if any, and wait for it to exit. """
+        if self._ponder_thread is not None:
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+    def opponent_moved(self, move):
+        """Notification from `Board.play` that the opponent played `move`.
+
+        Stops pondering; the result is kept for the next get_move() call if
+        the opponent played the predicted reply and discarded otherwise (the
+        transposition table entries stay valid either way).
+        """
+        self.stop_pondering()
+        if self._ponder_reply is None:
+            return
+        if move == self._ponder_reply:
+            self.ponder_hits += 1
+        else:
+            self.ponder_misses += 1
+            self._ponder_move = None
+        self._ponder_reply = None
+
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -399,50 +1022,483 @@ class AlphaBetaPlayer(IsolationPlayer):
         if not possible_moves:
             return (-1, -1)
 
-        best_move = (-1, -1)
+        best_move, _, _ = self.search_root(game, possible_moves, depth, alpha, beta)
+        return best_move
+
+    def search_root(self, game, moves, depth, alpha=float("-inf"),
+                    beta=float("inf"), shared_alpha=None):
+        """Search the root `moves` of `game` to `depth` plies.
+
+        Parameters
+        ----------
+        shared_alpha : multiprocessing.Value (optional)
+            An alpha bound shared with other processes searching the other
+            root moves; it is read before each move and raised whenever this
+            search improves on it.
+
+        Returns
+        -------
+        ((int, int), float, bool)
+            The best move, its score, and whether the score is exact (False
+            if it is only an upper bound because the move failed low against
+            an alpha bound raised by another process).
+        """
+        hash_move = None
+        if self.tt is not None:
+            # scores are relative to this player, so the key must also say
+            # which seat (player 1 or player 2) the player occupies
+            is_player_1 = (game.active_player == self) == (game.move_count % 2 == 0)
+            self._tt_seat = 0 if is_player_1 else SEAT_KEY
+            key, sym = self.tt_key(game)
+            hash_move = self.tt_move(game, key, sym)
+        self._root_ply = game.move_count
+        self._extensions_left = self.extension_budget
+        # read the timer at the first node: the node counter and the timer
+        # may have changed since the last search
+        self._next_check = self.nodes
+        if self.clock is not None:
+            self.clock.start()
+        moves = self.order_moves(game, moves, hash_move, 0)
+
+        # every move may score -inf (a lost position): play the first one
+        # rather than return (-1, -1), which would forfeit the game
+        best_move = moves[0]
         score = float("-inf")
+        exact = False
 
-        for move in possible_moves:
-            next_position = game.forecast_move(move)
-            v = self.min_value(next_position, depth - 1, alpha, beta)
-            alpha = max([v, alpha])
+        for move in moves:
+            if shared_alpha is not None:
+                alpha = max(alpha, shared_alpha.value)
+            v = self.search_child(game, move, self.min_value, depth - 1, alpha, beta)
             if score < v:
                 score = v
                 best_move = move
-        return best_move
+                exact = v > alpha or shared_alpha is None
+                if self.ordering:
+                    self.record_pv(game, move, depth)
+                if shared_alpha is not None and exact:
+                    with shared_alpha.get_lock():
+                        shared_alpha.value = max(shared_alpha.value, v)
+            alpha = max([v, alpha])
 
-    def max_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD:
+        if self.tt is not None and shared_alpha is None:
+            self.tt.store(key, depth, TT_EXACT, score,
+                          game.transform_move(best_move, sym) if sym else best_move)
+        self._root_score = score
+        return best_move, score, exact
+
+    def check_time(self):
+        """Raise SearchTimeout if the search must stop, and schedule the
+        next timer check: at the next node, or as scheduled by the clock. """
+        slack = self.time_left() - self.TIMER_THRESHOLD
+        if slack < 0:
             raise SearchTimeout()
+        if self.clock is None:
+            self._next_check = self.nodes + 1
+        else:
+            self._next_check = self.clock.next_sample(self.nodes, slack)
+
+    def tt_key(self, game):
+        """Return the transposition table key of `game` and the symmetry
+        that maps it to the frame of the stored moves (0 unless the table
+        is keyed on symmetry classes). """
+        if self.symmetry:
+            key, sym = game.canonical_hash()
+            return key ^ self._tt_seat, sym
+        return game.hash() ^ self._tt_seat, 0
+
+    def tt_move(self, game, key, sym):
+        """Return the transposition table move stored under `key`, mapped
+        back from the frame of symmetry `sym` to `game`, or None. """
+        move = self.tt.best_move(key)
+        if sym and move is not None:
+            move = game.transform_move(move, sym, inverse=True)
+        return move
+
+    def solved(self):
+        """Return True if the last root search proved a win or a loss.
+
+        Scores of +/-inf only come from finished games, so once the root
+        score is infinite every line has been resolved and deeper
+        iterations cannot change the result.
+        """
+        return self._root_score in (float("inf"), float("-inf"))
+
+    def search_child(self, game, move, value_fn, depth, alpha, beta):
+        """Return the value of the position reached by applying `move` to
+        `game`, as computed by `value_fn` (max_value or min_value).
+
+        In in-place mode the move is applied to `game` itself and undone
+        before returning, including when a SearchTimeout unwinds the search.
+        """
+        if not self.in_place:
+            return self.search_extended(game.forecast_move(move), value_fn, depth,
+                                        alpha, beta)
+        game.apply_move(move)
+        try:
+            return self.search_extended(game, value_fn, depth, alpha, beta)
+        finally:
+            game.undo_move()
+
+    def search_extended(self, game, value_fn, depth, alpha, beta):
+        """Return value_fn(game, depth, alpha, beta), searching one ply
+        deeper if either player has at most `extension_moves` legal moves
+        and the extension budget of the current line is not used up. """
+        if self._extensions_left <= 0 or not self.extension_moves:
+            return value_fn(game, depth, alpha, beta)
+        limit = self.extension_moves
+        if (game.mobility(game.active_player) > limit and
+                game.mobility(game.inactive_player) > limit):
+            return value_fn(game, depth, alpha, beta)
+        self.extensions += 1
+        self._extensions_left -= 1
+        try:
+            return value_fn(game, depth + 1, alpha, beta)
+        finally:
+            self._extensions_left += 1
+
+    def new_move_ordering(self):
+        """Reset the move ordering state at the start of a new move; the
+        history scores are halved rather than cleared so they age out. """
+        self._pv = {}
+        self._pv_line = []
+        self._pv_keys = []
+        self._killers = {}
+        for history in self._history:
+            for move in history:
+                history[move] //= 2
+
+    def save_principal_variation(self, game):
+        """Record the principal variation of the completed iteration, with
+        the hash of each position along it, to be searched first by the next
+        iteration. """
+        self._pv_line = self._pv.get(0, [])
+        self._pv_keys = []
+        position = game.copy()
+        for move in self._pv_line:
+            if move not in position.get_legal_moves():
+                break
+            self._pv_keys.append(position.hash())
+            position.apply_move(move)
+        self._pv = {}
+
+    def order_moves(self, game, moves, hash_move, side):
+        """Return `moves` in the order they should be searched.
+
+        The transposition table move is always searched first. With ordering
+        enabled it is followed by the principal variation move (if the node
+        lies on the previous principal variation), the killer moves of the
+        ply, and the remaining moves by decreasing history score for `side`
+        (0 for maximizing nodes, 1 for minimizing nodes).
+        """
+        if not self.ordering:
+            if hash_move is None or hash_move not in moves:
+                return moves
+            return [hash_move] + [m for m in moves if m != hash_move]
+
+        ply = game.move_count - self._root_ply
+        pv_move = None
+        if ply < len(self._pv_keys) and self._pv_keys[ply] == game.hash():
+            pv_move = self._pv_line[ply]
+        killers = self._killers.get(ply, ())
+        history = self._history[side]
+
+        def rank(move):
+            if move == hash_move:
+                return 1 << 62
+            if move == pv_move:
+                return 1 << 61
+            if move in killers:
+                return 1 << 60
+            return history.get(move, 0)
+
+        moves.sort(key=rank, reverse=True)
+        return moves
+
+    def record_cutoff(self, game, move, depth, side):
+        """Update the killer moves and history scores after `move` caused a
+        beta (side 0) or alpha (side 1) cutoff with `depth` plies left. """
+        ply = game.move_count - self._root_ply
+        killers = self._killers.get(ply)
+        if killers is None:
+            self._killers[ply] = [move]
+        elif move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        history = self._history[side]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def record_pv(self, game, move, depth):
+        """Set the principal variation of the node searched to `depth` to
+        `move` followed by the principal variation of its child. """
+        ply = game.move_count - self._root_ply
+        child_line = self._pv.get(ply + 1, []) if depth > 1 else []
+        self._pv[ply] = [move] + child_line
+
+    def leaf_values(self, game, moves, depth):
+        """Return the scores of the children of a node one ply above the
+        horizon in a single vectorized call, or None to search them one by
+        one (batching disabled, deeper node, or unsupported position). """
+        if depth != 1 or self._batch_score is None:
+            return None
+        return self._batch_score(game, moves, self)
 
-        if depth == 0 or len(game.get_legal_moves()) == 0:
+    def max_value(self, game, depth, alpha, beta):
+        if self.nodes >= self._next_check:
+            self.check_time()
+        self.nodes += 1
+
+        legal_moves = game.get_legal_moves()
+        if depth == 0 or len(legal_moves) == 0:
             return self.score(game, self)
 
+        tt = self.tt
+        hash_move = None
+        if tt is not None:
+            key, sym = self.tt_key(game)
+            cached = tt.probe(key, depth, alpha, beta)
+            if cached is not None:
+                return cached
+            hash_move = self.tt_move(game, key, sym)
+            alpha_orig = alpha
+        legal_moves = self.order_moves(game, legal_moves, hash_move, 0)
+        if self.ordering:
+            self._pv[game.move_count - self._root_ply] = []
+
         v = float("-inf")
-        legal_moves = game.get_legal_moves()
+        best_move = legal_moves[0]
+        leaf_values = self.leaf_values(game, legal_moves, depth)
 
-        for move in legal_moves:
-            next_position = game.forecast_move(move)
-            v = max(v, self.min_value(next_position, depth - 1, alpha, beta))
+        for i, move in enumerate(legal_moves):
+            if leaf_values is not None:
+                child_v = leaf_values[i]
+            else:
+                child_v = self.search_child(game, move, self.min_value, depth - 1, alpha, beta)
+            if child_v > v:
+                v, best_move = child_v, move
+                if self.ordering and alpha < v < beta:
+                    self.record_pv(game, move, depth)
             if v >= beta:
-                return v
+                self.cutoffs += 1
+                if self.ordering:
+                    self.record_cutoff(game, move, depth, 0)
+                break
             alpha = max([v, alpha])
+
+        if tt is not None:
+            flag = TT_LOWER if v >= beta else TT_UPPER if v <= alpha_orig else TT_EXACT
+            tt.store(key, depth, flag, v,
+                     game.transform_move(best_move, sym) if sym else best_move)
         return v
 
     def min_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        if self.nodes >= self._next_check:
+            self.check_time()
+        self.nodes += 1
 
-        if depth == 0 or len(game.get_legal_moves()) == 0:
+        legal_moves = game.get_legal_moves()
+        if depth == 0 or len(legal_moves) == 0:
             return self.score(game, self)
 
+        tt = self.tt
+        hash_move = None
+        if tt is not None:
+            key, sym = self.tt_key(game)
+            cached = tt.probe(key, depth, alpha, beta)
+            if cached is not None:
+                return cached
+            hash_move = self.tt_move(game, key, sym)
+            beta_orig = beta
+        legal_moves = self.order_moves(game, legal_moves, hash_move, 1)
+        if self.ordering:
+            self._pv[game.move_count - self._root_ply] = []
+
         v = float("inf")
-        legal_moves = game.get_legal_moves()
+        best_move = legal_moves[0]
+        leaf_values = self.leaf_values(game, legal_moves, depth)
 
-        for move in legal_moves:
-            next_position = game.forecast_move(move)
-            v = min(v, self.max_value(next_position, depth - 1, alpha, beta))
+        for i, move in enumerate(legal_moves):
+            if leaf_values is not None:
+                child_v = leaf_values[i]
+            else:
+                child_v = self.search_child(game, move, self.max_value, depth - 1, alpha, beta)
+            if child_v < v:
+                v, best_move = child_v, move
+                if self.ordering and alpha < v < beta:
+                    self.record_pv(game, move, depth)
             if v <= alpha:
-                return v
+                self.cutoffs += 1
+                if self.ordering:
+                    self.record_cutoff(game, move, depth, 1)
+                break
             beta = min([v, beta])
-        return v
\ No newline at end of file
+
+        if tt is not None:
+            flag = TT_UPPER if v <= alpha else TT_LOWER if v >= beta_orig else TT_EXACT
+            tt.store(key, depth, flag, v,
+                     game.transform_move(best_move, sym) if sym else best_move)
+        return v
+
+
+# Stands in for the opponent on the boards rebuilt by search worker processes
+_OPPONENT = "opponent"
+
+# The searcher and shared alpha bound of a parallel search worker process
+_WORKER = None
+
+
+def _init_search_worker(searcher, shared_alpha):
+    global _WORKER
+    _WORKER = searcher, shared_alpha
+
+
+def _search_root_moves(task):
+    """Search a subset of the root moves in a worker process, returning the
+    result of AlphaBetaPlayer.search_root(), or None if the deadline (a
+    timeit.default_timer() value) expired first.
+    """
+    board_cls, width, height, state, moves, depth, deadline = task
+    searcher, shared_alpha = _WORKER
+    if bin(state[0]).count("1") % 2 == 0:
+        game = board_cls(searcher, _OPPONENT, width=width, height=height)
+    else:
+        game = board_cls(_OPPONENT, searcher, width=width, height=height)
+    game.set_state(state)
+    searcher.time_left = lambda: 1000 * (deadline - timeit.default_timer())
+    try:
+        return searcher.search_root(game, moves, depth, shared_alpha=shared_alpha)
+    except SearchTimeout:
+        return None
+
+
+class ParallelAlphaBetaPlayer(AlphaBetaPlayer):
+    """Game-playing agent that splits the root moves of every iterative
+    deepening iteration across a pool of worker processes (root splitting).
+
+    The workers share one alpha bound, so a good score found by one worker
+    prunes the moves searched by the others.  Each worker stops at a
+    deadline derived from `time_left`, and an iteration only counts if every
+    worker finished it.  The pool is started on the first call to get_move()
+    and is not copied when the player is pickled.  Because collecting the
+    workers' results takes time after the deadline, the player tracks how
+    far past the deadline the pool returned and moves later deadlines
+    earlier by that much.
+
+    Call close() when the player is no longer needed, or use it as a
+    context manager, to stop the pool; it is also stopped when the player
+    is garbage collected.
+
+    Parameters
+    ----------
+    workers : int (optional)
+        Number of worker processes; defaults to the number of CPUs.
+    """
+    def __init__(self, search_depth=3, score_fn=defensive, timeout=10.,
+                 tt_size=0, ordering=False, workers=None):
+        super().__init__(search_depth, score_fn, timeout, in_place=True,
+                         tt_size=tt_size, ordering=ordering)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._shared_alpha = None
+        self._overshoot = 0.
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_pool"] = None
+        state["_shared_alpha"] = None
+        return state
+
+    def start(self):
+        """Start the worker processes if they are not running. """
+        if self._pool is None:
+            self._shared_alpha = multiprocessing.Value("d", float("-inf"))
+            tt_size = self.tt.size if self.tt is not None else 0
+            searcher = AlphaBetaPlayer(score_fn=self.score, timeout=0.,
+                                       in_place=True, tt_size=tt_size,
+                                       ordering=self.ordering)
+            self._pool = multiprocessing.Pool(
+                self.workers, initializer=_init_search_worker,
+                initargs=(searcher, self._shared_alpha))
+
+    def close(self):
+        """Stop the worker processes. """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        # __init__ may have failed before the pool attribute was set
+        if getattr(self, "_pool", None) is not None:
+            self.close()
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.time_left = time_left
+        self.start()
+        moves = game.get_legal_moves()
+        if not moves:
+            return (-1, -1)
+
+        best_move = moves[0]
+        completed_depth = 0
+        for depth in range(1, game.width * game.height - game.move_count + 1):
+            remaining = self.time_left() - self.TIMER_THRESHOLD
+            if remaining <= 0:
+                break
+            deadline = timeit.default_timer() + remaining / 1000. - self._overshoot
+            moves = [best_move] + [m for m in moves if m != best_move]
+            result = self.parallel_root(game, moves, depth, deadline)
+            if result is None:
+                break
+            best_move = result
+            completed_depth = depth
+            if self.solved():
+                break
+
+        self.completed_depths.append(completed_depth)
+        return best_move
+
+    def parallel_root(self, game, moves, depth, deadline):
+        """Search `moves` to `depth` with the root moves dealt round-robin to
+        the workers, returning the best move or None if any worker ran out
+        of time before the timeit.default_timer() `deadline`.
+        """
+        self.start()
+        self._shared_alpha.value = float("-inf")
+        chunks = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+        state = game.get_state()
+        tasks = [(type(game), game.width, game.height, state, chunk, depth, deadline)
+                 for chunk in chunks]
+        results = self._pool.map(_search_root_moves, tasks)
+        if any(result is None for result in results):
+            overshoot = timeit.default_timer() - deadline
+            self._overshoot = max(0.9 * self._overshoot, overshoot)
+            return None
+        best_move, self._root_score, _ = max(results, key=lambda result: (result[1], result[2]))
+        return best_move
@@ -0,0 +1,303 @@
+"""
+This file contains the `BitBoard` class, an alternative backend for the game
+Isolation that packs the blocked cells into a single integer bitmask.
+
+The class is API-compatible with `isolation.Board`, so any agent written
+against `Board` can play on a `BitBoard` unchanged.  Cell indices follow the
+same column-major layout as `Board` (index = row + column * height), and the
+knight moves available from every cell are precomputed once per board size
+as integer masks, so move generation, move application, copying and hashing
+each reduce to a handful of integer operations.
+"""
+import random
+
+from .isolation import (Board, ZOBRIST_MASK, neighbor_table, symmetric_zobrist_hash,
+                        symmetric_zobrist_table)
+from .symmetry import symmetries
+
+# Knight-move masks and index-to-coordinate tables, shared by all boards of
+# the same (width, height)
+_TABLES = {}
+
+
+def knight_tables(width, height):
+    """Return the precomputed bitmask tables for a board of the given size.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    (list<int>, list<(int, int)>)
+        A list with the mask of on-board knight moves from each cell index,
+        and a list mapping each cell index to its (row, column) coordinates.
+    """
+    key = (width, height)
+    if key not in _TABLES:
+        neighbors, coords = neighbor_table(width, height)
+        masks = [sum(1 << n for n in cell) for cell in neighbors]
+        _TABLES[key] = (masks, coords)
+    return _TABLES[key]
+
+
+class BitBoard(Board):
+    """Implement the Isolation `Board` interface on top of an integer bitmask
+    of blocked cells.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        # Bit i of _blocked is set once cell index i has been occupied;
+        # _locs holds the cell index of player 1 and player 2 (or NOT_MOVED)
+        self._blocked = 0
+        self._locs = [Board.NOT_MOVED, Board.NOT_MOVED]
+        self._initiative = 0
+        self._full = (1 << (width * height)) - 1
+        self._moves, self._coords = knight_tables(width, height)
+        self._symmetries = symmetries(width, height)
+        self._block_keys, self._loc_keys, self._side_key = \
+            symmetric_zobrist_table(width, height)
+        self._zobrist = 0
+        self._undo_stack = []
+
+    def hash(self):
+        """Return the Zobrist hash of the current state, which covers the
+        blocked cells, both player locations and the initiative. """
+        return self._zobrist & ZOBRIST_MASK
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        # Same attribute order as __init__, see Board.copy()
+        new_board = object.__new__(BitBoard)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._blocked = self._blocked
+        new_board._locs = self._locs[:]
+        new_board._initiative = self._initiative
+        new_board._full = self._full
+        new_board._moves = self._moves
+        new_board._coords = self._coords
+        new_board._symmetries = self._symmetries
+        new_board._block_keys = self._block_keys
+        new_board._loc_keys = self._loc_keys
+        new_board._side_key = self._side_key
+        new_board._zobrist = self._zobrist
+        new_board._undo_stack = []
+        return new_board
+
+    def get_state(self):
+        """Return a compact, picklable description of the position; see
+        Board.get_state(). """
+        return self._blocked, self._locs[0], self._locs[1]
+
+    def set_state(self, state):
+        """Replace the position with one returned by get_state() on a board
+        of the same size, keeping the registered players. The undo history
+        is cleared.
+        """
+        self._blocked, p1_loc, p2_loc = state
+        self._locs = [p1_loc, p2_loc]
+        self.move_count = bin(self._blocked).count("1")
+        self._initiative = self.move_count % 2
+        if self._initiative:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        else:
+            self._active_player, self._inactive_player = self._player_1, self._player_2
+        self._zobrist = symmetric_zobrist_hash(self.width, self.height, state)
+        self._undo_stack = []
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._unpack(self._full & ~self._blocked)
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._locs[self._player_index(player)]
+        if idx is Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coords[idx]
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        idx = self._locs[self._player_index(player)]
+        if idx is Board.NOT_MOVED:
+            return self.get_blank_spaces()
+        valid_moves = self._unpack(self._moves[idx] & ~self._blocked)
+        random.shuffle(valid_moves)
+        return valid_moves
+
+    def mobility(self, player=None):
+        """Return the number of legal moves of the specified player (the
+        active player if None), counted on the move mask without building
+        the move list. """
+        if player is None:
+            player = self._active_player
+        idx = self._locs[self._player_index(player)]
+        if idx is Board.NOT_MOVED:
+            return bin(self._full & ~self._blocked).count("1")
+        return bin(self._moves[idx] & ~self._blocked).count("1")
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        prev_idx = self._locs[self._initiative]
+        loc_keys = self._loc_keys[self._initiative]
+        self._zobrist ^= self._block_keys[idx] ^ loc_keys[idx] ^ self._side_key
+        if prev_idx is not Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        self._undo_stack.append(prev_idx)
+        self._locs[self._initiative] = idx
+        self._blocked |= 1 << idx
+        self._initiative ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def undo_move(self):
+        """Revert the last move applied to this board object in-place,
+        restoring the previous player locations, initiative and move count.
+        """
+        if not self._undo_stack:
+            raise RuntimeError("There is no move to undo on this board.")
+        self._initiative ^= 1
+        idx = self._locs[self._initiative]
+        prev_idx = self._undo_stack.pop()
+        loc_keys = self._loc_keys[self._initiative]
+        self._zobrist ^= self._block_keys[idx] ^ loc_keys[idx] ^ self._side_key
+        if prev_idx is not Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        self._blocked ^= 1 << idx
+        self._locs[self._initiative] = prev_idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        p1_loc, p2_loc = self._locs
+
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._blocked >> idx & 1:
+                    out += ' '
+                elif p1_loc == idx:
+                    out += symbols[0]
+                elif p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    def _player_index(self, player):
+        """Return 0 for player 1 and 1 for player 2. """
+        if player == self._player_1:
+            return 0
+        elif player == self._player_2:
+            return 1
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def _unpack(self, mask):
+        """Convert a cell bitmask into a list of (row, column) coordinates. """
+        coords = self._coords
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(coords[low.bit_length() - 1])
+            mask ^= low
+        return cells
@@ -0,0 +1,200 @@
+"""
+This file contains an exact solver for partitioned Isolation endgames.
+
+Once no blank cell can be reached by both players, the players can no longer
+interfere with each other and the game reduces to counting, for each player,
+the longest knight path through the blank cells of its own region: the
+player to move wins exactly when its longest path is longer than the
+opponent's.  `EndgameSolver` finds the longest path by depth-first search
+over bitmasks, memoized on (region bitmask, position), where the region is
+re-derived by flood fill after every move so that equivalent positions
+share their memo entries.  Moves are tried in Warnsdorff order (fewest
+onward moves first), branches are pruned with a bound from the knight's
+alternating square colors, and a search only has to reach a target length
+(the length that wins the game) rather than the longest path.
+"""
+from .bitboard import knight_tables
+
+
+def reachable(free, loc, masks):
+    """Return the bitmask of cells in `free` reachable from cell index `loc`
+    through a sequence of knight moves that only visit cells in `free`. """
+    region = 0
+    frontier = masks[loc] & free
+    while frontier:
+        region |= frontier
+        step = 0
+        while frontier:
+            low = frontier & -frontier
+            step |= masks[low.bit_length() - 1]
+            frontier ^= low
+        frontier = step & free & ~region
+    return region
+
+
+def popcount(mask):
+    """Return the number of set bits of `mask`. """
+    return bin(mask).count("1")
+
+
+class EndgameSolver:
+    """Detect and solve partitioned positions for one board size.
+
+    The memo is kept between calls, since the longest path from a position
+    in a region does not depend on the rest of the board.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    check : callable (optional)
+        Called every `check_interval` search nodes; it may raise to abort a
+        solve that is taking too long (the memo keeps the finished work).
+
+    max_entries : int (optional)
+        The memo is cleared when it grows past this many entries.
+    """
+
+    def __init__(self, width, height, check=None, check_interval=1024,
+                 max_entries=2 ** 20):
+        self.width = width
+        self.height = height
+        self.masks, self.coords = knight_tables(width, height)
+        self.full = (1 << (width * height)) - 1
+        # cells of the same color as cell index 0 (a knight changes color
+        # with every move)
+        self.color = sum(1 << idx for idx, (r, c) in enumerate(self.coords)
+                         if (r + c) % 2 == 0)
+        self.check = check
+        self.check_interval = check_interval
+        self.max_entries = max_entries
+        self.memo = {}
+        self.nodes = 0
+
+    def regions(self, game):
+        """Return the regions reachable by the active and inactive players of
+        `game`, or None if the regions overlap or a player has not moved.
+
+        Returns
+        -------
+        (int, int, int, int) or None
+            The active player's cell index and region bitmask, and the
+            inactive player's cell index and region bitmask.
+        """
+        blocked, p1_loc, p2_loc = game.get_state()
+        if p1_loc is None or p2_loc is None:
+            return None
+        if game.move_count % 2:
+            p1_loc, p2_loc = p2_loc, p1_loc
+        free = self.full & ~blocked
+        active = reachable(free, p1_loc, self.masks)
+        inactive = reachable(free, p2_loc, self.masks)
+        if active & inactive:
+            return None
+        return p1_loc, active, p2_loc, inactive
+
+    def bound(self, region, loc):
+        """Return an upper bound on the longest path from `loc` through
+        `region`: the path alternates between the two square colors, so it
+        cannot use many more cells of one color than of the other. """
+        same = self.color if self.color >> loc & 1 else self.full ^ self.color
+        n_same = popcount(region & same)
+        n_other = popcount(region) - n_same
+        return 2 * min(n_same, n_other) + (n_other > n_same)
+
+    def longest_path(self, region, loc, target=None):
+        """Return the number of moves in the longest knight path starting at
+        cell index `loc` that visits only cells of `region`, which must be
+        the region reachable from `loc`.
+
+        If `target` is given the search stops as soon as it finds a path of
+        at least `target` moves, and returns that path's length; the result
+        is exact whenever it is less than `target`.
+        """
+        key = (region, loc)
+        entry = self.memo.get(key)
+        if entry is not None:
+            length, exact = entry
+            if exact or (target is not None and length >= target):
+                return length
+
+        self.nodes += 1
+        if self.check is not None and self.nodes % self.check_interval == 0:
+            self.check()
+
+        bound = self.bound(region, loc)
+        if target is not None:
+            bound = min(bound, target)
+        length = 0
+        children = []
+        moves = self.masks[loc] & region
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            idx = low.bit_length() - 1
+            rest = reachable(region ^ low, idx, self.masks)
+            children.append((popcount(self.masks[idx] & rest), idx, rest))
+        children.sort()
+
+        for _, idx, rest in children:
+            if length >= bound:
+                break
+            # a path through idx cannot be longer than 1 + its bound
+            if 1 + self.bound(rest, idx) <= length:
+                continue
+            sub_target = None if target is None else target - 1
+            length = max(length, 1 + self.longest_path(rest, idx, sub_target))
+
+        if len(self.memo) >= self.max_entries:
+            self.memo.clear()
+        self.memo[key] = (length, target is None or length < target)
+        return length
+
+    def solve(self, game):
+        """Solve `game` exactly if the players' regions are separated.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        Returns
+        -------
+        ((int, int), bool) or None
+            None if the position is not partitioned; otherwise the move to
+            play ((-1, -1) if the active player has no legal move) and
+            whether the active player wins with it. A winning move leaves a
+            path longer than the opponent's longest path; in a lost position
+            the move maximizes the active player's longest path.
+        """
+        regions = self.regions(game)
+        if regions is None:
+            return None
+        loc, region, opp_loc, opp_region = regions
+        opp_length = self.longest_path(opp_region, opp_loc)
+
+        best_move, length = (-1, -1), 0
+        moves = self.masks[loc] & region
+        children = []
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            idx = low.bit_length() - 1
+            rest = reachable(region ^ low, idx, self.masks)
+            children.append((popcount(self.masks[idx] & rest), idx, rest))
+        children.sort()
+
+        # first look for a win, which only needs a long enough path
+        for _, idx, rest in children:
+            if 1 + self.longest_path(rest, idx, opp_length) > opp_length:
+                return self.coords[idx], True
+        for _, idx, rest in children:
+            path = 1 + self.longest_path(rest, idx)
+            if path > length:
+                best_move, length = self.coords[idx], path
+        return best_move, False
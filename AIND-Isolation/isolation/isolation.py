@@ -9,10 +9,142 @@ be available to project reviewers.
 """
 import random
 import timeit
+from contextlib import contextmanager
 from copy import copy
 
+from .symmetry import canonical_state, symmetries
+
 TIME_LIMIT_MILLIS = 150
 
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+# Knight-move neighbor tables and Zobrist keys, shared by all boards of the
+# same (width, height)
+_NEIGHBOR_TABLES = {}
+_ZOBRIST_TABLES = {}
+_SYMMETRIC_ZOBRIST_TABLES = {}
+
+# Width of a Zobrist key, and of each lane of a symmetric Zobrist key
+ZOBRIST_BITS = 64
+ZOBRIST_MASK = (1 << ZOBRIST_BITS) - 1
+
+
+def neighbor_table(width, height):
+    """Return the precomputed knight-move tables for a board of the given size.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    (list<tuple<int>>, list<(int, int)>)
+        A list with the on-board knight-move neighbor indices of each cell
+        index, and a list mapping each cell index to its (row, column)
+        coordinates.
+    """
+    key = (width, height)
+    if key not in _NEIGHBOR_TABLES:
+        coords = [(idx % height, idx // height) for idx in range(width * height)]
+        neighbors = [tuple(r + dr + (c + dc) * height for dr, dc in DIRECTIONS
+                           if 0 <= r + dr < height and 0 <= c + dc < width)
+                     for r, c in coords]
+        _NEIGHBOR_TABLES[key] = (neighbors, coords)
+    return _NEIGHBOR_TABLES[key]
+
+
+def zobrist_table(width, height):
+    """Return the Zobrist hashing keys for a board of the given size.
+
+    The keys are drawn from a generator seeded by the board size, so every
+    process computes the same hash for the same position.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    (list<int>, (list<int>, list<int>), int)
+        The 64-bit keys for a blocked cell at each cell index, the keys for
+        player 1 and player 2 standing at each cell index, and the key
+        toggled whenever the initiative changes.
+    """
+    key = (width, height)
+    if key not in _ZOBRIST_TABLES:
+        rng = random.Random("zobrist-{}x{}".format(width, height))
+        cells = width * height
+        block_keys = [rng.getrandbits(64) for _ in range(cells)]
+        loc_keys = tuple([rng.getrandbits(64) for _ in range(cells)] for _ in range(2))
+        _ZOBRIST_TABLES[key] = (block_keys, loc_keys, rng.getrandbits(64))
+    return _ZOBRIST_TABLES[key]
+
+
+def symmetric_zobrist_table(width, height):
+    """Return Zobrist keys that hash a position under all the board
+    symmetries at once.
+
+    Each key packs one 64-bit lane per symmetry (see
+    `symmetry.symmetries`): lane s is the zobrist_table() key of the image
+    of the cell under symmetry s, so the XOR of the keys of a position
+    holds in lane s the hash of its image under symmetry s. Lane 0 is the
+    identity, which is the plain Zobrist hash.
+
+    Returns
+    -------
+    (list<int>, (list<int>, list<int>), int)
+        The packed keys, laid out as in zobrist_table().
+    """
+    key = (width, height)
+    if key not in _SYMMETRIC_ZOBRIST_TABLES:
+        block_keys, loc_keys, side_key = zobrist_table(width, height)
+        perms = [perm for perm, _ in symmetries(width, height)]
+
+        def pack(keys):
+            return [sum(keys[perm[idx]] << (ZOBRIST_BITS * sym)
+                        for sym, perm in enumerate(perms))
+                    for idx in range(width * height)]
+
+        _SYMMETRIC_ZOBRIST_TABLES[key] = (
+            pack(block_keys), tuple(pack(keys) for keys in loc_keys),
+            sum(side_key << (ZOBRIST_BITS * sym) for sym in range(len(perms))))
+    return _SYMMETRIC_ZOBRIST_TABLES[key]
+
+
+def zobrist_hash(width, height, state):
+    """Compute from scratch the Zobrist hash of a state returned by
+    Board.get_state() on a board of the given size. """
+    return symmetric_zobrist_hash(width, height, state) & ZOBRIST_MASK
+
+
+def symmetric_zobrist_hash(width, height, state):
+    """Compute from scratch the packed hashes of a state under all the board
+    symmetries (see symmetric_zobrist_table()). """
+    block_keys, loc_keys, side_key = symmetric_zobrist_table(width, height)
+    blocked, p1_loc, p2_loc = state
+    key = 0
+    idx = 0
+    while blocked:
+        if blocked & 1:
+            key ^= block_keys[idx]
+        blocked >>= 1
+        idx += 1
+    for keys, loc in zip(loc_keys, (p1_loc, p2_loc)):
+        if loc is not None:
+            key ^= keys[loc]
+    if bin(state[0]).count("1") % 2:
+        key ^= side_key
+    return key
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -51,9 +183,79 @@ class Board(object):
         self._board_state = [Board.BLANK] * (width * height + 3)
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
+        self._neighbors, self._coords = neighbor_table(width, height)
+
+        # Bitmask of the blocked cell indices, kept in step with the board
+        # state so that get_state() does not have to scan the board
+        self._blocked = 0
+
+        # Cell indices of the legal moves of player 1 and player 2 (None for
+        # a player that has not moved), updated by apply_move() from the
+        # cells around the move only; the lists are replaced, never
+        # modified, so the undo stack and copies can share them
+        self._legal = [None, None]
+
+        # Zobrist hashes of the state under every board symmetry, packed in
+        # one integer and updated incrementally by every move
+        self._symmetries = symmetries(width, height)
+        self._block_keys, self._loc_keys, self._side_key = \
+            symmetric_zobrist_table(width, height)
+        self._zobrist = 0
+
+        # Previous location of the moving player for every move applied to
+        # this board object, used by undo_move() to restore the state
+        self._undo_stack = []
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        """Return the Zobrist hash of the current state, which covers the
+        blocked cells, both player locations and the initiative. """
+        return self._zobrist & ZOBRIST_MASK
+
+    def canonical_hash(self):
+        """Return a hash shared by all the rotations and reflections of the
+        current state, and the symmetry that maps the state to the
+        representative of its class.
+
+        Returns
+        -------
+        (int, int)
+            The smallest of the Zobrist hashes of the images of the state,
+            and the index of the symmetry producing that image (see
+            transform_move()).
+        """
+        hashes = self._zobrist
+        best, best_sym = hashes & ZOBRIST_MASK, 0
+        for sym in range(1, len(self._symmetries)):
+            hashes >>= ZOBRIST_BITS
+            value = hashes & ZOBRIST_MASK
+            if value < best:
+                best, best_sym = value, sym
+        return best, best_sym
+
+    def canonical_state(self):
+        """Return the representative of the symmetry class of the current
+        state and the symmetry that maps the state to it.
+
+        Returns
+        -------
+        ((int, int, int), int)
+            The image of get_state() with the smallest value, with NO_CELL
+            (see `symmetry`) for a player that has not moved, and the index
+            of the symmetry producing it (see transform_move()).
+        """
+        return canonical_state(self.get_state(), self.width, self.height)
+
+    def transform_move(self, move, sym, inverse=False):
+        """Return the image of `move` under symmetry `sym`, or its preimage
+        if `inverse` is True.
+
+        A move found for the representative returned by canonical_hash()
+        or canonical_state() is mapped back to the current state with
+        inverse=True.
+        """
+        perm, inverse_perm = self._symmetries[sym]
+        idx = (inverse_perm if inverse else perm)[move[0] + move[1] * self.height]
+        return idx % self.height, idx // self.height
 
     @property
     def active_player(self):
@@ -92,11 +294,28 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        # Set the attributes in the order of __init__ without rebuilding the
+        # shared tables: the copy costs O(1) besides the board state list,
+        # and keeps the attribute layout of boards built by __init__
+        new_board = object.__new__(type(self))
+        new_board.width = self.width
+        new_board.height = self.height
         new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._neighbors = self._neighbors
+        new_board._coords = self._coords
+        new_board._blocked = self._blocked
+        new_board._legal = self._legal[:]
+        new_board._symmetries = self._symmetries
+        new_board._block_keys = self._block_keys
+        new_board._loc_keys = self._loc_keys
+        new_board._side_key = self._side_key
+        new_board._zobrist = self._zobrist
+        new_board._undo_stack = []
         return new_board
 
     def forecast_move(self, move):
@@ -118,6 +337,40 @@ class Board(object):
         new_board.apply_move(move)
         return new_board
 
+    def get_state(self):
+        """Return a compact, picklable description of the position.
+
+        Returns
+        -------
+        (int, int or None, int or None)
+            A bitmask of the blocked cell indices (index = row + column *
+            height) and the cell index of player 1 and player 2, or None
+            for a player that has not moved. The move count and initiative
+            follow from the number of blocked cells.
+        """
+        return self._blocked, self._board_state[-1], self._board_state[-2]
+
+    def set_state(self, state):
+        """Replace the position with one returned by get_state() on a board
+        of the same size, keeping the registered players. The undo history
+        is cleared.
+        """
+        blocked, p1_loc, p2_loc = state
+        cells = self.width * self.height
+        self._board_state = [int(blocked >> idx & 1) for idx in range(cells)]
+        self.move_count = sum(self._board_state)
+        self._board_state += [self.move_count % 2, p2_loc, p1_loc]
+        self._blocked = blocked
+        if self.move_count % 2:
+            self._active_player, self._inactive_player = self._player_2, self._player_1
+        else:
+            self._active_player, self._inactive_player = self._player_1, self._player_2
+        self._legal = [None if loc is None else
+                       [n for n in self._neighbors[loc] if not blocked >> n & 1]
+                       for loc in (p1_loc, p2_loc)]
+        self._zobrist = symmetric_zobrist_hash(self.width, self.height, state)
+        self._undo_stack = []
+
     def move_is_legal(self, move):
         """Test whether a move is legal in the current game state.
 
@@ -187,8 +440,34 @@ class Board(object):
             for the player constrained by the current game state.
         """
         if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+            player = self._active_player
+        cells = self._legal[self._player_index(player)]
+        if cells is None:
+            return self.get_blank_spaces()
+        coords = self._coords
+        valid_moves = [coords[idx] for idx in cells]
+        random.shuffle(valid_moves)
+        return valid_moves
+
+    def mobility(self, player=None):
+        """Return the number of legal moves of the specified player (the
+        active player if None) in O(1), without building the move list.
+        """
+        if player is None:
+            player = self._active_player
+        cells = self._legal[self._player_index(player)]
+        if cells is None:
+            return self.width * self.height - self.move_count
+        return len(cells)
+
+    def _player_index(self, player):
+        """Return 0 for player 1 and 1 for player 2. """
+        if player == self._player_1:
+            return 0
+        elif player == self._player_2:
+            return 1
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -201,19 +480,75 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        prev_idx = self._board_state[-last_move_idx]
+        loc_keys = self._loc_keys[last_move_idx - 1]
+        self._zobrist ^= self._block_keys[idx] ^ loc_keys[idx] ^ self._side_key
+        if prev_idx is not Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        legal = self._legal
+        self._undo_stack.append((prev_idx, legal[0], legal[1]))
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
+        self._blocked |= 1 << idx
+        # only the mover's moves and the opponent's move to `idx` change
+        state = self._board_state
+        legal[last_move_idx - 1] = [n for n in self._neighbors[idx] if not state[n]]
+        other = legal[2 - last_move_idx]
+        if other is not None and idx in other:
+            legal[2 - last_move_idx] = [n for n in other if n != idx]
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def undo_move(self):
+        """Revert the last move applied to this board object in-place,
+        restoring the previous player locations, initiative and move count.
+
+        Only moves applied with apply_move() on this object can be undone;
+        a board returned by copy() or forecast_move() starts with an empty
+        undo history.
+        """
+        if not self._undo_stack:
+            raise RuntimeError("There is no move to undo on this board.")
+        last_move_idx = int(self._inactive_player == self._player_2) + 1
+        idx = self._board_state[-last_move_idx]
+        prev_idx, self._legal[0], self._legal[1] = self._undo_stack.pop()
+        loc_keys = self._loc_keys[last_move_idx - 1]
+        self._zobrist ^= self._block_keys[idx] ^ loc_keys[idx] ^ self._side_key
+        if prev_idx is not Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        self._board_state[idx] = Board.BLANK
+        self._blocked ^= 1 << idx
+        self._board_state[-last_move_idx] = prev_idx
+        self._board_state[-3] ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+
+    @contextmanager
+    def temporary_move(self, move):
+        """Context manager that applies a move in-place on entry and undoes
+        it on exit, even if the body raises an exception (e.g., a search
+        timeout).
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        self.apply_move(move)
+        try:
+            yield self
+        finally:
+            self.undo_move()
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self.mobility(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self.mobility(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,7 +572,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.mobility(self._active_player):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -247,21 +582,6 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
-        """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
-        """
-        if loc == Board.NOT_MOVED:
-            return self.get_blank_spaces()
-
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
-        return valid_moves
-
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
         return self.to_string()
@@ -329,6 +649,12 @@ class Board(object):
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
 
+            # let the opponent learn the move (e.g., to stop pondering) before
+            # its own timer starts, or before the game ends
+            notify = getattr(self._inactive_player, "opponent_moved", None)
+            if notify is not None:
+                notify(curr_move)
+
             if move_end < 0:
                 return self._inactive_player, move_history, "timeout"
 
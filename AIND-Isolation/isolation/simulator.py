@@ -0,0 +1,142 @@
+"""
+This file contains a headless simulator for bulk Isolation playouts.
+
+`Board.play` times every move, hands each player a copy of the board and
+records the move history, which a fair match needs but a batch of playouts
+(e.g., to generate data or to estimate the strength of a fast policy) does
+not.  `simulate` plays a batch of games between two policies directly on
+the compact state of `Board.get_state()` -- a blocked-cell bitmask and the
+two player cells -- with the knight-move masks of the board size, and
+returns the outcomes as compact arrays.
+
+A policy is any callable taking (blocked, own_loc, opp_loc, moves), where
+`blocked` is the bitmask of blocked cell indices (index = row + column *
+height), `own_loc` and `opp_loc` the cell indices of the player to move and
+of its opponent (None before their first move), and `moves` the non-empty
+list of legal destination cells; it returns one of `moves`.  The lists are
+shared between calls and must not be modified.
+"""
+import random
+
+from array import array
+
+from .bitboard import knight_tables
+from .isolation import neighbor_table
+
+
+class RandomPolicy:
+    """Policy that plays a uniformly random legal move, drawn from its own
+    generator so that a batch of games is reproducible.
+
+    Parameters
+    ----------
+    seed : object (optional)
+        Seed of the policy's random number generator.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.random = self.rng.random
+
+    def __call__(self, blocked, own_loc, opp_loc, moves):
+        return moves[int(self.random() * len(moves))]
+
+
+class GreedyPolicy:
+    """Policy that plays the move leaving it the most onward moves, minus
+    the moves left to the opponent, breaking ties at random.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board the policy plays on.
+
+    seed : object (optional)
+        Seed of the policy's tie-breaking random number generator.
+    """
+
+    def __init__(self, width, height, seed=None):
+        self.neighbors = neighbor_table(width, height)[0]
+        self.rng = random.Random(seed)
+
+    def __call__(self, blocked, own_loc, opp_loc, moves):
+        neighbors = self.neighbors
+        best, best_score = [], None
+        for move in moves:
+            after = blocked | 1 << move
+            score = sum(1 for n in neighbors[move] if not after >> n & 1)
+            if opp_loc is not None:
+                score -= sum(1 for n in neighbors[opp_loc] if not after >> n & 1)
+            if best_score is None or score > best_score:
+                best, best_score = [move], score
+            elif score == best_score:
+                best.append(move)
+        return best[0] if len(best) == 1 else self.rng.choice(best)
+
+
+def simulate(policy_1, policy_2, games, width=7, height=7, state=None):
+    """Play `games` games between two policies and return their outcomes.
+
+    Parameters
+    ----------
+    policy_1, policy_2 : callable
+        The policies of player 1 and player 2 (see the module docstring).
+
+    games : int
+        The number of games to play.
+
+    width, height : int (optional)
+        The size of the board.
+
+    state : (int, int or None, int or None) (optional)
+        The position every game starts from, as returned by
+        `Board.get_state()`; the empty board by default.
+
+    Returns
+    -------
+    (array.array, array.array)
+        For every game, the winner (0 for player 1, 1 for player 2) as an
+        array of unsigned bytes, and the number of moves played from the
+        start position as an array of unsigned shorts.
+
+    Raises
+    ------
+    ValueError
+        If a policy returns a move that is not legal.
+    """
+    masks = knight_tables(width, height)[0]
+    full = (1 << (width * height)) - 1
+    # the legal moves of every mask of free destination cells met so far
+    cells_of = {}
+    start_blocked, start_p1, start_p2 = state if state is not None else (0, None, None)
+    start_seat = bin(start_blocked).count("1") % 2
+    policies = (policy_1, policy_2)
+    winners = array("B", bytes(games))
+    lengths = array("H", bytes(2 * games))
+
+    for game in range(games):
+        blocked = start_blocked
+        locs = [start_p1, start_p2]
+        seat = start_seat
+        plies = 0
+        while True:
+            loc = locs[seat]
+            free = (full if loc is None else masks[loc]) & ~blocked
+            if not free:
+                break
+            moves = cells_of.get(free)
+            if moves is None:
+                moves = cells_of[free] = [idx for idx in range(free.bit_length())
+                                          if free >> idx & 1]
+            move = policies[seat](blocked, loc, locs[1 - seat], moves)
+            if not free >> move & 1:
+                raise ValueError("Policy {} returned the illegal move {}.".format(
+                    seat + 1, move))
+            blocked |= 1 << move
+            locs[seat] = move
+            seat ^= 1
+            plies += 1
+        # the player to move has no legal moves and loses
+        winners[game] = seat ^ 1
+        lengths[game] = plies
+    return winners, lengths
@@ -0,0 +1,103 @@
+"""
+This file contains the symmetry tables of Isolation boards.
+
+Knight moves are preserved by the rotations and reflections of the board,
+so positions that are images of each other under a symmetry have the same
+game value, with moves mapped through the same symmetry.  Every symmetry
+is precomputed once per board size as a permutation of the cell indices
+(index = row + column * height), which lets a position be reduced to the
+representative of its symmetry class (see `canonical_state` and
+`Board.canonical_hash`) and a move found for the representative be mapped
+back to the original position.
+"""
+
+# Cell index used in canonical states for a player that has not moved yet
+NO_CELL = 255
+
+# Symmetry permutations and their inverses, shared by all boards of the same
+# (width, height)
+_SYMMETRIES = {}
+
+
+def symmetries(width, height):
+    """Return the cell index permutations of the board symmetries.
+
+    Square boards have eight symmetries (rotations and reflections); other
+    boards have four (the identity, the two mirror images and the half
+    turn). Knight moves are preserved by all of them.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    list<(list<int>, list<int>)>
+        A (permutation, inverse permutation) pair for each symmetry, where
+        permutation[idx] is the image of cell index idx (index = row +
+        column * height). The identity comes first.
+    """
+    key = (width, height)
+    if key not in _SYMMETRIES:
+        last_r, last_c = height - 1, width - 1
+        transforms = [lambda r, c: (r, c),
+                      lambda r, c: (last_r - r, c),
+                      lambda r, c: (r, last_c - c),
+                      lambda r, c: (last_r - r, last_c - c)]
+        if width == height:
+            transforms += [lambda r, c: (c, r),
+                           lambda r, c: (c, last_r - r),
+                           lambda r, c: (last_c - c, r),
+                           lambda r, c: (last_c - c, last_r - r)]
+        tables = []
+        for transform in transforms:
+            perm = [0] * (width * height)
+            for c in range(width):
+                for r in range(height):
+                    tr, tc = transform(r, c)
+                    perm[r + c * height] = tr + tc * height
+            inverse = [0] * len(perm)
+            for idx, image in enumerate(perm):
+                inverse[image] = idx
+            tables.append((perm, inverse))
+        _SYMMETRIES[key] = tables
+    return _SYMMETRIES[key]
+
+
+def transform_state(state, perm):
+    """Apply a cell permutation to a state returned by Board.get_state().
+
+    Only the blocked cells are visited, so early positions are transformed
+    in a handful of operations. Player locations in the result use NO_CELL
+    for a player that has not moved, so that the states are totally
+    ordered.
+    """
+    blocked, p1_loc, p2_loc = state
+    image = 0
+    while blocked:
+        low = blocked & -blocked
+        image |= 1 << perm[low.bit_length() - 1]
+        blocked ^= low
+    return (image,
+            NO_CELL if p1_loc is None else perm[p1_loc],
+            NO_CELL if p2_loc is None else perm[p2_loc])
+
+
+def canonical_state(state, width, height):
+    """Return the canonical image of `state` under the board symmetries and
+    the index of the symmetry that produces it.
+
+    Player locations in the canonical state use NO_CELL for a player that
+    has not moved, so that the states are totally ordered.
+    """
+    best = None
+    best_sym = 0
+    for sym, (perm, _) in enumerate(symmetries(width, height)):
+        image = transform_state(state, perm)
+        if best is None or image < best:
+            best, best_sym = image, sym
+    return best, best_sym
@@ -0,0 +1,287 @@
+"""Learned evaluation functions for Isolation.
+
+A `LearnedScore` scores a position with a model fitted to self-play data
+(see `self_play.py`): a logistic regression or a small multilayer
+perceptron over a few handcrafted features, predicting the log-odds that
+the player wins.  The features are computed from the blocked-cell bitmask
+and the knight-move tables, and the model is evaluated in plain Python, so
+a `LearnedScore` is cheap enough to score alpha-beta leaves and plugs in
+wherever a `score_fn` is expected:
+
+    score_fn = LearnedScore.load("learned_eval.json")
+    player = AlphaBetaPlayer(score_fn=score_fn)
+
+Fit a model with, e.g.:
+
+    python learned_eval.py --data selfplay.bin --model mlp --output learned_eval.json
+
+Training requires NumPy; scoring does not.
+"""
+import argparse
+import json
+import math
+import os
+
+from isolation.bitboard import knight_tables
+
+# Names of the features returned by features(), all from the perspective of
+# the player being scored ("own") against its opponent ("opp")
+FEATURES = ("own_moves", "opp_moves", "own_reach", "opp_reach", "shared_moves",
+            "fill", "own_moves_fill", "opp_moves_fill", "own_center",
+            "opp_center", "to_move")
+
+# Knight-move masks, the full-board mask and the normalized squared distance
+# of every cell from the center, shared by all boards of the same (width,
+# height)
+_TABLES = {}
+
+
+def feature_tables(width, height):
+    """Return the knight-move masks, the mask of all cells and the squared
+    distance of each cell index from the center of the board, divided by
+    its largest value. """
+    key = (width, height)
+    if key not in _TABLES:
+        masks, coords = knight_tables(width, height)
+        center_r, center_c = (height - 1) / 2., (width - 1) / 2.
+        distance = [(r - center_r) ** 2 + (c - center_c) ** 2 for r, c in coords]
+        largest = max(distance) or 1.
+        _TABLES[key] = (masks, (1 << (width * height)) - 1,
+                        [d / largest for d in distance])
+    return _TABLES[key]
+
+
+def reach(mask, free, masks):
+    """Return the cells of `free` reachable in at most one more knight move
+    from the cells of `mask`. """
+    result = mask
+    while mask:
+        low = mask & -mask
+        result |= masks[low.bit_length() - 1]
+        mask ^= low
+    return result & free
+
+
+def state_features(state, width, height, own_seat):
+    """Return the features of a state returned by Board.get_state() for the
+    player in seat `own_seat` (0 for player 1, 1 for player 2), or None if
+    a player has not moved yet. """
+    blocked, p1_loc, p2_loc = state
+    if p1_loc is None or p2_loc is None:
+        return None
+    masks, full, center = feature_tables(width, height)
+    own, opp = (p1_loc, p2_loc) if own_seat == 0 else (p2_loc, p1_loc)
+    free = full & ~blocked
+    own_mask = masks[own] & free
+    opp_mask = masks[opp] & free
+    own_moves = bin(own_mask).count("1")
+    opp_moves = bin(opp_mask).count("1")
+    fill = bin(blocked).count("1") / (width * height)
+    return [own_moves, opp_moves,
+            bin(reach(own_mask, free, masks)).count("1"),
+            bin(reach(opp_mask, free, masks)).count("1"),
+            bin(own_mask & opp_mask).count("1"),
+            fill, own_moves * fill, opp_moves * fill,
+            center[own], center[opp],
+            1. if bin(blocked).count("1") % 2 == own_seat else 0.]
+
+
+def features(game, player):
+    """Return the features of `game` for `player`, or None if a player has
+    not moved yet. """
+    own_seat = 0 if (player == game.active_player) == (game.move_count % 2 == 0) else 1
+    return state_features(game.get_state(), game.width, game.height, own_seat)
+
+
+class LearnedScore:
+    """An evaluation function fitted to self-play data: calling it with
+    (game, player) returns +/-inf for won and lost positions and otherwise
+    the model's log-odds that `player` wins.
+
+    Parameters
+    ----------
+    model : dict
+        The model, as written by save(): a "kind" ("linear" or "mlp") and
+        its weights, which apply to the raw features (the training
+        standardization is folded into the first layer).
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.kind = model["kind"]
+        if self.kind == "linear":
+            self.weights = model["weights"]
+            self.bias = model["bias"]
+        else:
+            # one row of input weights per hidden unit
+            self.hidden = [list(row) for row in zip(*model["hidden_weights"])]
+            self.hidden_bias = model["hidden_bias"]
+            self.output = model["output_weights"]
+            self.bias = model["output_bias"]
+
+    def __call__(self, game, player):
+        x = features(game, player)
+        if x is None:
+            return 0.
+        own_moves, opp_moves, to_move = x[0], x[1], x[-1]
+        if to_move and not own_moves:
+            return float("-inf")
+        if not to_move and not opp_moves:
+            return float("inf")
+        if self.kind == "linear":
+            return self.bias + sum(w * v for w, v in zip(self.weights, x))
+        score = self.bias
+        for row, b, w in zip(self.hidden, self.hidden_bias, self.output):
+            score += w * math.tanh(b + sum(u * v for u, v in zip(row, x)))
+        return score
+
+    def save(self, path):
+        """Write the model to `path` as JSON. """
+        with open(path, "w") as f:
+            json.dump(self.model, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save(). """
+        with open(path) as f:
+            return cls(json.load(f))
+
+
+def training_set(positions, width, height):
+    """Return the features and labels of self-play `positions` (see
+    self_play.load_positions()) from the perspective of both players. """
+    X, y = [], []
+    for state, winner in positions:
+        for seat in (0, 1):
+            x = state_features(state, width, height, seat)
+            if x is not None:
+                X.append(x)
+                y.append(1. if winner == seat else 0.)
+    return X, y
+
+
+def fit_linear(X, y, epochs=500, learning_rate=0.5, l2=1e-4):
+    """Fit a logistic regression to standardized features by full-batch
+    gradient descent; return the weights and the bias. """
+    import numpy as np
+
+    w = np.zeros(X.shape[1])
+    b = 0.
+    for _ in range(epochs):
+        p = 1. / (1. + np.exp(-(X @ w + b)))
+        w -= learning_rate * (X.T @ (p - y) / len(y) + l2 * w)
+        b -= learning_rate * np.mean(p - y)
+    return w, b
+
+
+def fit_mlp(X, y, hidden=16, epochs=30, batch_size=256, learning_rate=0.01,
+            l2=1e-4, seed=0):
+    """Fit a one-hidden-layer tanh network to standardized features with
+    minibatch Adam on the cross-entropy; return the input weights and
+    biases and the output weights and bias. """
+    import numpy as np
+
+    rng = np.random.RandomState(seed)
+    params = [rng.normal(0., 1. / math.sqrt(X.shape[1]), (X.shape[1], hidden)),
+              np.zeros(hidden), rng.normal(0., 1. / math.sqrt(hidden), hidden),
+              np.zeros(1)]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), batch_size):
+            batch = order[start:start + batch_size]
+            xb, yb = X[batch], y[batch]
+            W1, b1, w2, b2 = params
+            h = np.tanh(xb @ W1 + b1)
+            p = 1. / (1. + np.exp(-(h @ w2 + b2)))
+            d_out = (p - yb) / len(yb)
+            d_hidden = np.outer(d_out, w2) * (1. - h ** 2)
+            grads = [xb.T @ d_hidden + l2 * W1, d_hidden.sum(axis=0),
+                     h.T @ d_out + l2 * w2, np.array([d_out.sum()])]
+            step += 1
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= 0.9
+                m += 0.1 * grad
+                v *= 0.999
+                v += 0.001 * grad ** 2
+                param -= (learning_rate * (m / (1. - 0.9 ** step)) /
+                          (np.sqrt(v / (1. - 0.999 ** step)) + 1e-8))
+    return params
+
+
+def train(positions, width, height, kind="linear", hidden=16, test_fraction=0.2,
+          seed=0):
+    """Fit a model to self-play `positions` and return it as a LearnedScore
+    along with its log-loss and accuracy on the training and test sets.
+
+    The last `test_fraction` of the positions is held out for testing.
+    Self-play files store the positions of each game together, so the
+    test set shares at most one game with the training set.
+    """
+    import numpy as np
+
+    split = int(len(positions) * (1 - test_fraction))
+    X, y = (np.array(a, dtype=np.float64)
+            for a in training_set(positions[:split], width, height))
+    X_test, y_test = (np.array(a, dtype=np.float64)
+                      for a in training_set(positions[split:], width, height))
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std == 0] = 1.
+
+    if kind == "linear":
+        w, b = fit_linear((X - mean) / std, y)
+        model = {"kind": "linear", "features": FEATURES,
+                 "weights": (w / std).tolist(),
+                 "bias": float(b - np.sum(w * mean / std))}
+    else:
+        W1, b1, w2, b2 = fit_mlp((X - mean) / std, y, hidden, seed=seed)
+        model = {"kind": "mlp", "features": FEATURES,
+                 "hidden_weights": (W1 / std[:, None]).tolist(),
+                 "hidden_bias": (b1 - (mean / std) @ W1).tolist(),
+                 "output_weights": w2.tolist(), "output_bias": float(b2[0])}
+    score_fn = LearnedScore(model)
+
+    def evaluate(X, y):
+        if not len(y):
+            return float("nan"), float("nan")
+        if kind == "linear":
+            logits = X @ np.array(model["weights"]) + model["bias"]
+        else:
+            h = np.tanh(X @ np.array(model["hidden_weights"]) + model["hidden_bias"])
+            logits = h @ np.array(model["output_weights"]) + model["output_bias"]
+        p = np.clip(1. / (1. + np.exp(-logits)), 1e-7, 1 - 1e-7)
+        loss = -np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))
+        return float(loss), float(np.mean((p > 0.5) == (y > 0.5)))
+
+    report = {"train": evaluate(X, y), "test": evaluate(X_test, y_test),
+              "examples": (len(y), len(y_test))}
+    return score_fn, report
+
+
+if __name__ == "__main__":
+    from self_play import load_positions
+
+    parser = argparse.ArgumentParser(description="Fit a learned Isolation evaluation.")
+    parser.add_argument("--data", default="selfplay.bin",
+                        help="Self-play data file written by self_play.py.")
+    parser.add_argument("--model", choices=["linear", "mlp"], default="linear",
+                        help="Logistic regression or one-hidden-layer network.")
+    parser.add_argument("--hidden", type=int, default=16,
+                        help="Hidden units of the network.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the network's initial weights.")
+    parser.add_argument("--output", default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "learned_eval.json"),
+                        help="Path of the model file to write.")
+    args = parser.parse_args()
+
+    width, height, positions = load_positions(args.data)
+    score_fn, report = train(positions, width, height, args.model, args.hidden,
+                             seed=args.seed)
+    score_fn.save(args.output)
+    print("Trained on {} examples, tested on {}".format(*report["examples"]))
+    for name in ("train", "test"):
+        print("{:<6} log-loss {:.4f}  accuracy {:.1%}".format(name, *report[name]))
+    print("Wrote the model to {}".format(args.output))
@@ -0,0 +1,264 @@
+"""Build and query opening books for Isolation.
+
+An opening book maps every early position (up to a fixed number of plies)
+to the move chosen by a deep offline search, so that an agent can play the
+opening instantly instead of searching where its search is shallowest.
+
+Positions that are rotations or reflections of each other share one entry:
+each position is reduced to the smallest of its symmetric images (see
+`Board.canonical_state`), and the book move is mapped back through the same
+symmetry when it is looked up.
+
+Build a book with, e.g.:
+
+    python opening_book.py --plies 3 --time 2000 --processes 4
+
+and pass the file to `competition_agent.CustomPlayer` (which loads
+`opening_book.bin` from this directory by default).
+"""
+import argparse
+import multiprocessing
+import os
+import struct
+
+from timeit import default_timer as timer
+
+from isolation import BitBoard
+from isolation.bitboard import knight_tables
+from isolation.symmetry import NO_CELL, canonical_state
+from game_agent import AlphaBetaPlayer, SearchTimeout
+
+# File header: magic, format version, board width, board height, max ply and
+# number of entries
+HEADER = struct.Struct("<4sBBBBI")
+MAGIC = b"ISOB"
+VERSION = 1
+
+
+class OpeningBook:
+    """Map early positions of a board size to precomputed moves.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    max_ply : int
+        The book covers positions with at most this many moves played.
+
+    entries : dict (optional)
+        Maps canonical states (see canonical_state()) to the cell index of
+        the book move in the canonical frame.
+    """
+
+    def __init__(self, width, height, max_ply, entries=None):
+        self.width = width
+        self.height = height
+        self.max_ply = max_ply
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, game):
+        """Return the book move for the active player of `game`, or None if
+        the position is not in the book.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        Returns
+        -------
+        (int, int) or None
+            The (row, column) of the book move, or None.
+        """
+        if (game.move_count > self.max_ply or game.width != self.width or
+                game.height != self.height):
+            return None
+        key, sym = game.canonical_state()
+        move = self.entries.get(key)
+        if move is None:
+            return None
+        return game.transform_move((move % self.height, move // self.height), sym,
+                                   inverse=True)
+
+    def save(self, path):
+        """Write the book to `path` in the compact binary format: a header
+        followed by one record per entry holding the blocked cell bitmask,
+        both player cells and the move cell. """
+        nbytes = (self.width * self.height + 7) // 8
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                                self.max_ply, len(self.entries)))
+            for (blocked, p1_loc, p2_loc), move in sorted(self.entries.items()):
+                f.write(blocked.to_bytes(nbytes, "little"))
+                f.write(bytes((p1_loc, p2_loc, move)))
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by save(). """
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, width, height, max_ply, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an opening book file.".format(path))
+        nbytes = (width * height + 7) // 8
+        size = nbytes + 3
+        entries = {}
+        offset = HEADER.size
+        for _ in range(count):
+            record = data[offset:offset + size]
+            blocked = int.from_bytes(record[:nbytes], "little")
+            p1_loc, p2_loc, move = record[nbytes:]
+            entries[(blocked, p1_loc, p2_loc)] = move
+            offset += size
+        return cls(width, height, max_ply, entries)
+
+
+def opening_positions(width, height, max_ply):
+    """Return the canonical states of every position reachable in at most
+    `max_ply` moves in which the player to move has a legal move. """
+    masks, _ = knight_tables(width, height)
+    full = (1 << (width * height)) - 1
+    frontier = {canonical_state((0, None, None), width, height)[0]}
+    positions = []
+    for ply in range(max_ply + 1):
+        following = set()
+        for state in sorted(frontier):
+            blocked, p1_loc, p2_loc = state
+            loc = p1_loc if ply % 2 == 0 else p2_loc
+            free = (full if loc == NO_CELL else masks[loc]) & ~blocked
+            if not free:
+                continue
+            positions.append(state)
+            if ply == max_ply:
+                continue
+            while free:
+                low = free & -free
+                idx = low.bit_length() - 1
+                free ^= low
+                locs = (idx, p2_loc) if ply % 2 == 0 else (p1_loc, idx)
+                child = (blocked | low,) + tuple(None if l == NO_CELL else l
+                                                 for l in locs)
+                following.add(canonical_state(child, width, height)[0])
+        frontier = following
+    return positions
+
+
+# Evaluation function used by search_position(), set in each worker process
+_SCORE_FN = None
+
+
+def _init_worker(score_fn):
+    global _SCORE_FN
+    _SCORE_FN = score_fn
+
+
+def search_position(task):
+    """Search one canonical state and return it with the chosen move cell.
+
+    The search uses iterative deepening up to `depth` plies (0 for no
+    limit) within `time_limit` milliseconds.
+    """
+    state, width, height, depth, time_limit = task
+    player = AlphaBetaPlayer(score_fn=_SCORE_FN, in_place=True, tt_size=2 ** 18,
+                             ordering=True)
+    blocked, p1_loc, p2_loc = state
+    if bin(blocked).count("1") % 2 == 0:
+        game = BitBoard(player, "opponent", width, height)
+    else:
+        game = BitBoard("opponent", player, width, height)
+    game.set_state((blocked, None if p1_loc == NO_CELL else p1_loc,
+                    None if p2_loc == NO_CELL else p2_loc))
+
+    deadline = timer() + time_limit / 1000.
+    player.time_left = lambda: 1000 * (deadline - timer())
+    player.tt.new_search()
+    player.new_move_ordering()
+    move = (-1, -1)
+    try:
+        for d in range(1, (depth or width * height) + 1):
+            move = player.alphabeta(game, d)
+            player.save_principal_variation(game)
+    except SearchTimeout:
+        pass
+    if move == (-1, -1):
+        # the first iteration did not finish; pick any legal move
+        move = sorted(game.get_legal_moves())[0]
+    return state, move[0] + move[1] * height
+
+
+def build_book(width=7, height=7, max_ply=3, depth=0, time_limit=2000.,
+               processes=1, score_fn=None, verbose=False):
+    """Search every opening position up to `max_ply` and return the book.
+
+    Parameters
+    ----------
+    depth : int (optional)
+        Maximum search depth per position; 0 searches until `time_limit`.
+
+    time_limit : float (optional)
+        Milliseconds of search per position.
+
+    processes : int (optional)
+        Number of worker processes searching positions in parallel.
+
+    score_fn : callable (optional)
+        The evaluation function; defaults to competition_agent.custom_score.
+    """
+    if score_fn is None:
+        from competition_agent import custom_score
+        score_fn = custom_score
+    positions = opening_positions(width, height, max_ply)
+    tasks = [(state, width, height, depth, time_limit) for state in positions]
+    book = OpeningBook(width, height, max_ply)
+    start = timer()
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=(score_fn,))
+        results = pool.imap_unordered(search_position, tasks)
+    else:
+        pool = None
+        _init_worker(score_fn)
+        results = map(search_position, tasks)
+    for count, (state, move) in enumerate(results, 1):
+        book.entries[state] = move
+        if verbose and count % 100 == 0:
+            print("{}/{} positions searched in {:.0f} s".format(
+                count, len(tasks), timer() - start))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an Isolation opening book.")
+    parser.add_argument("--width", type=int, default=7,
+                        help="Number of board columns.")
+    parser.add_argument("--height", type=int, default=7,
+                        help="Number of board rows.")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="Cover positions with at most this many moves played.")
+    parser.add_argument("--depth", type=int, default=0,
+                        help="Maximum search depth per position (0 = time limited).")
+    parser.add_argument("--time", type=float, default=2000.,
+                        help="Milliseconds of search per position.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes searching positions in parallel.")
+    parser.add_argument("--output", default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "opening_book.bin"),
+                        help="Path of the book file to write.")
+    args = parser.parse_args()
+
+    book = build_book(args.width, args.height, args.plies, args.depth, args.time,
+                      args.processes, verbose=True)
+    book.save(args.output)
+    print("Wrote {} positions to {} ({} bytes)".format(
+        len(book), args.output, os.path.getsize(args.output)))
@@ -0,0 +1,216 @@
+"""Generate self-play training data for learned Isolation evaluations.
+
+Each game starts with a few seeded random moves, so that the games differ,
+and is then played to the end by two search players with `Board.play`.
+Every position of a game that ended normally (the player to move ran out
+of moves, not out of time) is written together with the winner, in a
+compact binary format: a header followed by one record per position
+holding the blocked cell bitmask, both player cells and the winner.
+
+Generate data with, e.g.:
+
+    python self_play.py --games 2000 --processes 4 --output selfplay.bin
+
+and fit an evaluation to it with `learned_eval.py`.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import struct
+
+from timeit import default_timer as timer
+
+import game_agent
+
+from isolation import BitBoard
+from game_agent import AlphaBetaPlayer, TimeManager
+
+# File header: magic, format version, board width, board height and number of
+# positions
+HEADER = struct.Struct("<4sBBBI")
+MAGIC = b"ISOD"
+VERSION = 1
+
+# Cell index stored for a player that has not moved yet
+NO_CELL = 255
+
+
+def record_size(width, height):
+    """Return the number of bytes of one position record. """
+    return (width * height + 7) // 8 + 3
+
+
+def pack_position(state, winner, width, height):
+    """Return the record of a state returned by Board.get_state() in a game
+    won by player `winner` (0 for player 1, 1 for player 2). """
+    blocked, p1_loc, p2_loc = state
+    return (blocked.to_bytes((width * height + 7) // 8, "little") +
+            bytes((NO_CELL if p1_loc is None else p1_loc,
+                   NO_CELL if p2_loc is None else p2_loc, winner)))
+
+
+def load_positions(path):
+    """Read a file written by generate().
+
+    Returns
+    -------
+    (int, int, list<((int, int or None, int or None), int)>)
+        The board width and height, and every position as a
+        (state, winner) pair, where the state is as returned by
+        Board.get_state() and the winner is 0 for player 1 and 1 for
+        player 2.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, width, height, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a self-play data file.".format(path))
+    nbytes = (width * height + 7) // 8
+    size = record_size(width, height)
+    positions = []
+    for offset in range(HEADER.size, HEADER.size + count * size, size):
+        blocked = int.from_bytes(data[offset:offset + nbytes], "little")
+        p1_loc, p2_loc, winner = data[offset + nbytes:offset + size]
+        positions.append(((blocked, None if p1_loc == NO_CELL else p1_loc,
+                           None if p2_loc == NO_CELL else p2_loc), winner))
+    return width, height, positions
+
+
+# Evaluation function of the self-play players, set in each worker process
+_SCORE_FN = None
+
+
+def _init_worker(score_fn):
+    global _SCORE_FN
+    _SCORE_FN = score_fn
+
+
+def play_game(task):
+    """Play one seeded self-play game.
+
+    Returns
+    -------
+    (str, bytes)
+        The termination reason returned by `Board.play` and the records of
+        the positions after the opening in which both players have moved
+        (no records if the game did not end normally).
+    """
+    seed, width, height, plies, time_limit = task
+    rng = random.Random(seed)
+    players = [AlphaBetaPlayer(score_fn=_SCORE_FN, timeout=time_limit / 4.,
+                               in_place=True, tt_size=2 ** 14, ordering=True,
+                               time_manager=TimeManager())
+               for _ in range(2)]
+    game = BitBoard(players[0], players[1], width, height)
+    for _ in range(plies):
+        moves = sorted(game.get_legal_moves())
+        if not moves:
+            break
+        game.apply_move(rng.choice(moves))
+    replay = game.copy()
+    winner, history, termination = game.play(time_limit=time_limit)
+    if termination != "illegal move":
+        return termination, b""
+
+    winner = players.index(winner)
+    records = []
+    for move in history:
+        state = replay.get_state()
+        if state[1] is not None and state[2] is not None:
+            records.append(pack_position(state, winner, width, height))
+        replay.apply_move(tuple(move))
+    return termination, b"".join(records)
+
+
+def generate(path, games, width=7, height=7, plies=4, time_limit=20.,
+             processes=1, score_fn=None, seed=0, verbose=False):
+    """Play `games` self-play games and write their positions to `path`.
+
+    Records are written as the games finish, so the data of a long run
+    never has to fit in memory.
+
+    Parameters
+    ----------
+    plies : int (optional)
+        Number of random moves opening each game.
+
+    time_limit : float (optional)
+        Milliseconds per move of the self-play players.
+
+    processes : int (optional)
+        Number of worker processes playing games in parallel.
+
+    score_fn : callable (optional)
+        The evaluation function of both players; defaults to
+        game_agent.defensive.
+
+    Returns
+    -------
+    (int, collections.Counter)
+        The number of positions written and the count of each game
+        termination reason.
+    """
+    from collections import Counter
+
+    score_fn = score_fn or game_agent.defensive
+    tasks = [(seed * games + i, width, height, plies, time_limit)
+             for i in range(games)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=(score_fn,))
+        results = pool.imap_unordered(play_game, tasks)
+    else:
+        pool = None
+        _init_worker(score_fn)
+        results = map(play_game, tasks)
+
+    count = 0
+    terminations = Counter()
+    size = record_size(width, height)
+    start = timer()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, 0))
+        for done, (termination, records) in enumerate(results, 1):
+            terminations[termination] += 1
+            f.write(records)
+            count += len(records) // size
+            if verbose and done % 100 == 0:
+                print("{}/{} games, {} positions in {:.0f} s".format(
+                    done, games, count, timer() - start))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, count))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return count, terminations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Isolation self-play data.")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="Number of self-play games.")
+    parser.add_argument("--width", type=int, default=7,
+                        help="Number of board columns.")
+    parser.add_argument("--height", type=int, default=7,
+                        help="Number of board rows.")
+    parser.add_argument("--plies", type=int, default=4,
+                        help="Random moves opening each game.")
+    parser.add_argument("--time", type=float, default=20.,
+                        help="Milliseconds per move of the self-play players.")
+    parser.add_argument("--score", default="defensive",
+                        help="Name of the game_agent evaluation function to play with.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the random openings.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes playing games in parallel.")
+    parser.add_argument("--output", default="selfplay.bin",
+                        help="Path of the data file to write.")
+    args = parser.parse_args()
+
+    count, terminations = generate(args.output, args.games, args.width, args.height,
+                                   args.plies, args.time, args.processes,
+                                   getattr(game_agent, args.score), args.seed,
+                                   verbose=True)
+    print("Wrote {} positions to {} ({} bytes); game endings: {}".format(
+        count, args.output, os.path.getsize(args.output), dict(terminations)))
@@ -12,19 +12,32 @@ once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
 import itertools
+import json
+import multiprocessing
+import os
 import random
 import warnings
 
 from collections import namedtuple
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 from isolation import Board
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, defensive,
-                        aggressive, center_play, defensive_to_aggressive)
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, SearchTelemetry,
+                        defensive, aggressive, center_play,
+                        defensive_to_aggressive)
 
 NUM_MATCHES = 25  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+TT_SIZE = 0  # transposition table slots for each test agent (0 disables)
+NUM_PROCESSES = None  # worker processes for games (None = physical cores)
+SEED = None  # seed for openings and per-game random seeds (None = random)
+TRACE_FILE = None  # JSON-lines file for the test agents' per-move search records
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -37,36 +50,137 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+# Players registered for play_game(), indexed by the game tasks; each worker
+# process receives its own copy through the pool initializer
+_PLAYERS = []
+
+
+def _init_worker(players):
+    global _PLAYERS
+    _PLAYERS = players
+
+
+def physical_cores():
+    """Return the number of physical CPU cores, falling back to the number
+    of logical CPUs when the physical count cannot be determined.
+    """
+    if psutil is not None:
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return cores
+    try:
+        with open("/proc/cpuinfo") as f:
+            cores = set()
+            physical_id = None
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":")[1].strip()
+                elif line.startswith("core id"):
+                    cores.add((physical_id, line.split(":")[1].strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def check_oversubscription(num_processes):
+    """Warn when the worker processes plus the current system load exceed
+    the physical cores, since per-move time limits are then unreliable.
+    """
+    cores = physical_cores()
+    load = os.getloadavg()[0] if hasattr(os, "getloadavg") else 0.
+    if num_processes + load > cores:
+        warnings.warn(("{} worker processes with a load average of {:.1f} " +
+                       "oversubscribe the {} physical cores; agents may time " +
+                       "out more often than in a serial run.").format(
+                           num_processes, load, cores))
+
+
+def play_game(task):
+    """Play one game between two registered players and return the index of
+    the winner, the termination reason, and the transposition table counters
+    and search telemetry records accumulated by each player during the game.
+    Telemetry records are tagged with the game seed and the opponent index.
+    """
+    first, second, opening, seed = task
+    random.seed(seed)
+    player_1, player_2 = _PLAYERS[first], _PLAYERS[second]
+    tables = {idx: _PLAYERS[idx].tt for idx in (first, second)
+              if getattr(_PLAYERS[idx], "tt", None) is not None}
+    before = {idx: tt.stats() for idx, tt in tables.items()}
+    logs = {idx: _PLAYERS[idx].telemetry for idx in (first, second)
+            if getattr(_PLAYERS[idx], "telemetry", None) is not None}
+    log_start = {idx: len(log.records) for idx, log in logs.items()}
+
+    game = Board(player_1, player_2)
+    for move in opening:
+        game.apply_move(move)
+    winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    for player in (player_1, player_2):
+        # a player that lost on time may still be pondering its last move
+        stop = getattr(player, "stop_pondering", None)
+        if stop is not None:
+            stop()
+
+    tt_stats = {idx: {k: v - before[idx][k] for k, v in tt.stats().items()
+                      if k != "hit_rate"}
+                for idx, tt in tables.items()}
+    records = {}
+    for idx, log in logs.items():
+        records[idx] = log.records[log_start[idx]:]
+        for record in records[idx]:
+            record["game"] = seed
+            record["opponent"] = second if idx == first else first
+    return (first if winner is player_1 else second), termination, tt_stats, records
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, pool=None,
+               rng=random):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    Games are independent, so they are spread across the worker processes
+    of `pool` when one is given; every game gets its own random seed drawn
+    from `rng`.
     """
     timeout_count = 0
     forfeit_count = 0
+    cpu_idx = _PLAYERS.index(cpu_agent.player)
+    tasks = []
     for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
-
         # initialize all games with a random move and response
+        game = Board(cpu_agent.player, test_agents[0].player)
+        opening = []
         for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
-
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
-
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+            move = rng.choice(sorted(game.get_legal_moves()))
+            game.apply_move(move)
+            opening.append(move)
+
+        for agent in test_agents:
+            test_idx = _PLAYERS.index(agent.player)
+            tasks.append((cpu_idx, test_idx, opening, rng.getrandbits(32)))
+            tasks.append((test_idx, cpu_idx, opening, rng.getrandbits(32)))
+
+    # play all games and tally the results
+    results = map(play_game, tasks) if pool is None else pool.imap(play_game, tasks)
+    for winner_idx, termination, tt_stats, records in results:
+        win_counts[_PLAYERS[winner_idx]] += 1
+
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
+
+        if pool is not None:
+            for idx, stats in tt_stats.items():
+                _PLAYERS[idx].tt.add_stats(stats)
+            for idx, log in records.items():
+                _PLAYERS[idx].telemetry.records.extend(log)
 
     return timeout_count, forfeit_count
 
@@ -77,8 +191,29 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, num_processes=1, seed=None,
+                 trace_file=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    Games run in a pool of `num_processes` worker processes (None for one
+    per physical core); the results are identical in form to a serial run.
+    The search telemetry of test agents that record it is summarized after
+    the results and, if `trace_file` is given, written to it as JSON lines.
+    """
+    players = []
+    for agent in cpu_agents + test_agents:
+        if agent.player not in players:
+            players.append(agent.player)
+    _init_worker(players)
+    if num_processes is None:
+        num_processes = physical_cores()
+    pool = None
+    if num_processes > 1:
+        check_oversubscription(num_processes)
+        pool = multiprocessing.Pool(num_processes, initializer=_init_worker,
+                                    initargs=(players,))
+    rng = random.Random(seed)
+
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
@@ -93,7 +228,7 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, pool, rng)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -106,6 +241,10 @@ def play_matches(cpu_agents, test_agents, num_matches):
             ) for i in range(0, len(round_totals), 2)
         ]))
 
+    if pool is not None:
+        pool.close()
+        pool.join()
+
     print("-" * 74)
     print('{:^9}{:^13}'.format("", "Win Rate:") +
         ''.join([
@@ -123,17 +262,72 @@ def play_matches(cpu_agents, test_agents, num_matches):
         print(("\nYour ID search forfeited {} games while there were still " +
                "legal moves available to play.\n").format(total_forfeits))
 
+    print_tt_stats(test_agents)
+    print_telemetry(test_agents)
+    if trace_file is not None:
+        write_trace(trace_file, cpu_agents + test_agents)
+
+
+def print_telemetry(agents):
+    """Report the aggregate search telemetry of agents that record it. """
+    agents = [a for a in agents if getattr(a.player, "telemetry", None) is not None]
+    if not agents:
+        return
+    print("\n{:<25}{:>7}{:>11}{:>7}{:>12}{:>12}{:>6}{:>9}{:>8}".format(
+        "Search telemetry", "Moves", "Nodes/move", "Depth", "Margin (ms)",
+        "Min margin", "Late", "No move", "TT hit"))
+    for agent in agents:
+        summary = SearchTelemetry.summary(agent.player.telemetry.records)
+        if not summary["moves"]:
+            continue
+        print("{:<25}{:>7}{:>11.0f}{:>7.2f}{:>12.1f}{:>12.1f}{:>6}{:>9}{:>7.1f}%".format(
+            agent.name, summary["moves"], summary["nodes"], summary["depth"],
+            summary["margin"], summary["min_margin"], summary["late"],
+            summary["no_move"], 100 * summary["tt_hit_rate"]))
+
+
+def write_trace(path, agents):
+    """Write the telemetry records of all agents that record it to `path`,
+    one JSON object per line, naming the agent and its opponent. """
+    names = {_PLAYERS.index(agent.player): agent.name for agent in agents}
+    with open(path, "w") as f:
+        for agent in agents:
+            telemetry = getattr(agent.player, "telemetry", None)
+            if telemetry is None:
+                continue
+            for record in telemetry.records:
+                line = dict(record, agent=agent.name)
+                if "opponent" in record:
+                    line["opponent"] = names[record["opponent"]]
+                f.write(json.dumps(line) + "\n")
+
+
+def print_tt_stats(agents):
+    """Report the transposition table counters of agents that have one. """
+    agents = [a for a in agents if getattr(a.player, "tt", None) is not None]
+    if not agents:
+        return
+    print("\n{:<25}{:>12}{:>12}{:>12}{:>10}".format(
+        "Transposition table", "Probes", "Hits", "Cutoffs", "Hit rate"))
+    for agent in agents:
+        stats = agent.player.tt.stats()
+        print("{:<25}{:>12}{:>12}{:>12}{:>9.1f}%".format(
+            agent.name, stats["probes"], stats["hits"], stats["cutoffs"],
+            100 * stats["hit_rate"]))
+
 
 def main():
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
     test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=defensive), "defensive"),
-        Agent(AlphaBetaPlayer(score_fn=aggressive), "aggressive"),
-        Agent(AlphaBetaPlayer(score_fn=center_play), "center play"),
-        Agent(AlphaBetaPlayer(score_fn=defensive_to_aggressive), "defensive to aggressive")
+        Agent(AlphaBetaPlayer(score_fn=score_fn, tt_size=TT_SIZE,
+                              telemetry=SearchTelemetry()), name)
+        for score_fn, name in [(improved_score, "AB_Improved"),
+                               (defensive, "defensive"),
+                               (aggressive, "aggressive"),
+                               (center_play, "center play"),
+                               (defensive_to_aggressive, "defensive to aggressive")]
     ]
 
     # Define a collection of agents to compete against the test agents
@@ -151,7 +345,8 @@ def main():
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    play_matches(cpu_agents, test_agents, NUM_MATCHES, NUM_PROCESSES, SEED,
+                 TRACE_FILE)
 
 
 if __name__ == "__main__":
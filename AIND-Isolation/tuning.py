@@ -0,0 +1,311 @@
+"""Tune Isolation heuristics with sequential probability ratio tests.
+
+Each candidate evaluation function is matched against a baseline (or, with
+no baseline, against every other candidate) by AlphaBetaPlayers that differ
+only in their score_fn.  Games are played in pairs, one from each seat of
+the same seeded random opening, in a pool of worker processes.  After every
+batch of games a sequential probability ratio test (SPRT) decides between
+H0: "the candidate is no stronger than `elo0`" and H1: "it is at least
+`elo1` Elo stronger", and a match stops as soon as either is accepted, so
+CPU is only spent until the result is clear.
+
+Candidates are game_agent or sample_players heuristics given by name, or
+weighted mobility scores given as `own,opp[,center]`, e.g.:
+
+    python tuning.py --baseline defensive --candidates aggressive 1.5,1 1,1,0.5
+"""
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import random
+
+import game_agent
+import sample_players
+
+from isolation import BitBoard
+from game_agent import AlphaBetaPlayer, TimeManager, distance_from_center
+
+
+class WeightedScore:
+    """A parameterized mobility heuristic: `own` times the player's moves,
+    minus `opp` times the opponent's moves, plus `center` times
+    game_agent.distance_from_center() of the player. defensive is
+    WeightedScore(2, 1), aggressive is WeightedScore(1, 2). """
+
+    def __init__(self, own=1., opp=1., center=0.):
+        self.own = own
+        self.opp = opp
+        self.center = center
+
+    def __call__(self, game, player):
+        if game.is_loser(player):
+            return float("-inf")
+
+        if game.is_winner(player):
+            return float("inf")
+
+        own_moves = game.mobility(player)
+        opp_moves = game.mobility(game.get_opponent(player))
+        score = self.own * own_moves - self.opp * opp_moves
+        if self.center:
+            score += self.center * distance_from_center(
+                game, game.get_player_location(player))
+        return float(score)
+
+    def __repr__(self):
+        return "WeightedScore({}, {}, {})".format(self.own, self.opp, self.center)
+
+
+def parse_candidate(spec):
+    """Return (name, score_fn) for the name of a heuristic in game_agent or
+    sample_players, or a comma-separated list of WeightedScore
+    parameters. """
+    for module in (game_agent, sample_players):
+        if hasattr(module, spec):
+            return spec, getattr(module, spec)
+    try:
+        weights = [float(w) for w in spec.split(",")]
+    except ValueError:
+        raise ValueError("{} is neither a known heuristic nor a list of "
+                         "weights.".format(spec))
+    return spec, WeightedScore(*weights)
+
+
+def expected_score(elo):
+    """Return the expected score of a player `elo` points stronger. """
+    return 1. / (1. + 10 ** (-elo / 400.))
+
+
+def elo(score):
+    """Return the Elo difference implied by an expected score, clipped to
+    +/-1200 for scores of 0 and 1. """
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400. * math.log10(1. / score - 1.)
+
+
+class SPRT:
+    """Sequential probability ratio test on the results of a match.
+
+    Isolation games cannot be drawn, so every game is a Bernoulli trial
+    and the log-likelihood ratio of H1 (the candidate scores s1, the
+    expected score of an `elo1` Elo advantage) against H0 (it scores s0,
+    for `elo0`) after W wins and L losses is exactly
+
+        W * log(s1 / s0) + L * log((1 - s1) / (1 - s0))
+
+    H1 is accepted when the ratio exceeds log((1 - beta) / alpha) and H0
+    when it falls below log(beta / (1 - alpha)).
+
+    Parameters
+    ----------
+    elo0, elo1 : float (optional)
+        The Elo differences of the two hypotheses.
+
+    alpha, beta : float (optional)
+        The probabilities of accepting H1 when H0 holds and of accepting H0
+        when H1 holds.
+    """
+
+    def __init__(self, elo0=0., elo1=20., alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = 0
+        self.games = 0
+
+    def add(self, win):
+        """Record the result of one game (True if the candidate won). """
+        self.wins += bool(win)
+        self.games += 1
+
+    def llr(self):
+        """Return the log-likelihood ratio of H1 against H0. """
+        s0, s1 = expected_score(self.elo0), expected_score(self.elo1)
+        return (self.wins * math.log(s1 / s0) +
+                (self.games - self.wins) * math.log((1 - s1) / (1 - s0)))
+
+    def decision(self):
+        """Return "H1", "H0", or None while the test is undecided. """
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self, z=1.96):
+        """Return the Elo estimate of the candidate and the bounds of its
+        confidence interval (95% by default), from the Wilson score
+        interval of its expected score. """
+        n = self.games
+        if not n:
+            return 0., float("-inf"), float("inf")
+        mean = self.wins / n
+        center = (mean + z * z / (2 * n)) / (1 + z * z / n)
+        error = z * math.sqrt(mean * (1 - mean) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return elo(mean), elo(center - error), elo(center + error)
+
+
+# Evaluation functions of the match, set in each worker process
+_SCORE_FNS = None
+
+
+def _init_worker(score_fns):
+    global _SCORE_FNS
+    _SCORE_FNS = score_fns
+
+
+def play_game(task):
+    """Play one game of a match and return its match index, whether the
+    candidate won, and the termination reason. """
+    match, candidate, baseline, seed, seat, plies, time_limit = task
+    players = [AlphaBetaPlayer(score_fn=_SCORE_FNS[idx], in_place=True,
+                               tt_size=2 ** 14, ordering=True,
+                               time_manager=TimeManager())
+               for idx in (candidate, baseline)]
+    first, second = players if seat == 0 else players[::-1]
+    game = BitBoard(first, second)
+    rng = random.Random(seed)
+    for _ in range(plies):
+        moves = sorted(game.get_legal_moves())
+        if not moves:
+            break
+        game.apply_move(rng.choice(moves))
+    winner, _, termination = game.play(time_limit=time_limit)
+    return match, winner is players[0], termination
+
+
+def run_matches(candidates, baseline=None, elo0=0., elo1=20., alpha=0.05,
+                beta=0.05, max_games=2000, time_limit=50., plies=2, processes=1,
+                seed=0, verbose=False):
+    """Match every candidate against `baseline`, or every pair of candidates
+    if there is no baseline, until each match's SPRT is decided or it has
+    played `max_games` games.
+
+    Parameters
+    ----------
+    candidates : list<(str, callable)>
+        Names and evaluation functions (picklable, when `processes` > 1).
+
+    baseline : (str, callable) (optional)
+        The name and evaluation function of the reference player.
+
+    time_limit : float (optional)
+        Milliseconds per move.
+
+    plies : int (optional)
+        Random moves opening each pair of games.
+
+    processes : int (optional)
+        Number of worker processes playing games in parallel.
+
+    Returns
+    -------
+    list<(str, str, SPRT, collections.Counter)>
+        For each match the candidate and opponent names, the test and the
+        count of each game termination reason.
+    """
+    from collections import Counter
+
+    entries = list(candidates) + ([baseline] if baseline is not None else [])
+    score_fns = [fn for _, fn in entries]
+    if baseline is not None:
+        pairs = [(idx, len(candidates)) for idx in range(len(candidates))]
+    else:
+        pairs = list(itertools.combinations(range(len(candidates)), 2))
+    tests = [SPRT(elo0, elo1, alpha, beta) for _ in pairs]
+    terminations = [Counter() for _ in pairs]
+    openings = [itertools.count(seed * max_games) for _ in pairs]
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=(score_fns,))
+        play = pool.imap_unordered
+    else:
+        pool = None
+        _init_worker(score_fns)
+        play = map
+    # enough pairs of games per batch to keep every worker busy
+    batch_pairs = max(1, processes)
+
+    while True:
+        tasks = []
+        for match, (candidate, opponent) in enumerate(pairs):
+            test = tests[match]
+            if test.decision() is not None or test.games >= max_games:
+                continue
+            for _ in range(min(batch_pairs, (max_games - test.games) // 2 or 1)):
+                opening = next(openings[match])
+                tasks += [(match, candidate, opponent, opening, seat, plies, time_limit)
+                          for seat in (0, 1)]
+        if not tasks:
+            break
+        for match, won, termination in play(play_game, tasks):
+            tests[match].add(won)
+            terminations[match][termination] += 1
+        if verbose:
+            print(", ".join("{} vs {}: {}/{} LLR {:.2f}".format(
+                entries[c][0], entries[o][0], t.wins, t.games, t.llr())
+                for (c, o), t in zip(pairs, tests)))
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return [(entries[c][0], entries[o][0], test, counts)
+            for (c, o), test, counts in zip(pairs, tests, terminations)]
+
+
+def print_results(results):
+    """Print the Elo estimate and SPRT decision of every match. """
+    print("\n{:<20}{:<20}{:>7}{:>8}{:>9}{:>16}{:>8}  {}".format(
+        "Candidate", "Opponent", "Games", "Score", "Elo", "95% interval", "LLR",
+        "Decision"))
+    for candidate, opponent, test, terminations in results:
+        estimate, low, high = test.elo()
+        decision = {"H1": "stronger", "H0": "not stronger"}.get(test.decision(),
+                                                               "undecided")
+        print("{:<20}{:<20}{:>7}{:>7.1f}%{:>9.1f}{:>16}{:>8.2f}  {}".format(
+            candidate, opponent, test.games, 100. * test.wins / max(1, test.games),
+            estimate, "[{:.0f}, {:.0f}]".format(low, high), test.llr(), decision))
+        abnormal = {k: v for k, v in terminations.items() if k != "illegal move"}
+        if abnormal:
+            print("    games not ended by a player running out of moves: {}".format(
+                abnormal))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune Isolation heuristics with SPRT matches.")
+    parser.add_argument("--candidates", nargs="+", required=True,
+                        help="Heuristic names or own,opp[,center] weights.")
+    parser.add_argument("--baseline", default=None,
+                        help="Heuristic every candidate plays against "
+                             "(default: all pairs of candidates).")
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference of the null hypothesis.")
+    parser.add_argument("--elo1", type=float, default=20.,
+                        help="Elo difference of the alternative hypothesis.")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="False positive rate.")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="False negative rate.")
+    parser.add_argument("--max-games", type=int, default=2000,
+                        help="Games after which an undecided match stops.")
+    parser.add_argument("--time-limit", type=float, default=50.,
+                        help="Milliseconds per move.")
+    parser.add_argument("--plies", type=int, default=2,
+                        help="Random moves opening each pair of games.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes playing games in parallel.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the random openings.")
+    args = parser.parse_args()
+
+    candidates = [parse_candidate(spec) for spec in args.candidates]
+    baseline = parse_candidate(args.baseline) if args.baseline else None
+    results = run_matches(candidates, baseline, args.elo0, args.elo1, args.alpha,
+                          args.beta, args.max_games, args.time_limit, args.plies,
+                          args.processes, args.seed, verbose=True)
+    print_results(results)
@@ -0,0 +1,203 @@
+"""Benchmarks for the air cargo problem representations.
+
+Every benchmark searches the same problems with each representation, so
+the node counts are identical and the times directly comparable.  Run
+`python benchmark.py -h` for the list of benchmarks.
+"""
+import argparse
+
+from timeit import default_timer as timer
+
+from aimacode.search import Node, uniform_cost_search
+from my_air_cargo_problems import (
+    AirCargoProblem, CompiledAirCargoProblem, air_cargo_instance, air_cargo_p1,
+    air_cargo_p2, air_cargo_p3,
+)
+from run_search import SEARCHES, PrintableProblem
+
+PROBLEMS = [("p1", air_cargo_p1), ("p2", air_cargo_p2), ("p3", air_cargo_p3)]
+
+
+class SearchLimit(Exception):
+    """ Raised by RecordingProblem when a search reaches its expansion limit. """
+    pass
+
+
+class LimitedProblem(PrintableProblem):
+    """ PrintableProblem that stops the search after `limit` expansions.
+    """
+
+    def __init__(self, problem, limit=None):
+        PrintableProblem.__init__(self, problem)
+        self.limit = limit
+
+    def actions(self, state):
+        if self.limit is not None and self.succs >= self.limit:
+            raise SearchLimit()
+        return PrintableProblem.actions(self, state)
+
+
+class RecordingProblem(LimitedProblem):
+    """ LimitedProblem that also records the states it was asked to expand,
+    in order.
+    """
+
+    def __init__(self, problem, limit=None):
+        LimitedProblem.__init__(self, problem, limit)
+        self.expanded = []
+
+    def actions(self, state):
+        actions = LimitedProblem.actions(self, state)
+        self.expanded.append(state)
+        return actions
+
+
+def parse_size(size):
+    """ Return the (cargos, planes, airports) of a size given as CxPxA. """
+    try:
+        cargos, planes, airports = map(int, size.split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "{} is not a size of the form CARGOSxPLANESxAIRPORTS.".format(size))
+    return cargos, planes, airports
+
+
+def problems(args, compiled):
+    """ Return the name, seed (None for fixed problems) and problem of
+    air_cargo_p1..p3 and of the generated instances of every size of
+    `--sizes`. """
+    result = [(name, None, problem_fn(compiled)) for name, problem_fn in PROBLEMS]
+    for size in args.sizes:
+        result.append(("x".join(map(str, size)), args.seed,
+                       air_cargo_instance(*size, seed=args.seed, compiled=compiled)))
+    return result
+
+
+def clear_heuristic_caches():
+    """ Empty the lru_cache of every air cargo heuristic, so that a search
+    does not reuse the heuristic values of an earlier one. """
+    for problem_cls in (AirCargoProblem, CompiledAirCargoProblem):
+        problem_cls.h_pg_levelsum.cache_clear()
+        problem_cls.h_ignore_preconditions.cache_clear()
+
+
+def bench_actions(args):
+    """Compare finding the applicable actions of the compiled problems by
+    testing every action and with the precondition index: the expansions
+    per second of a uniform cost search (stopped after `--expansions`), and
+    the actions() calls per second on the states that search expanded, in
+    the same order. """
+    print("{:<10}{:>9}{:>12}{:>8}{:>16}{:>16}".format(
+        "Problem", "Actions", "Expansions", "Index", "Search (exp/s)",
+        "actions() (/s)"))
+    for name, _, problem in problems(args, compiled=True):
+        for use_index in (False, True):
+            problem.use_index = use_index
+            ip = RecordingProblem(problem, args.expansions)
+            start = timer()
+            try:
+                uniform_cost_search(ip)
+            except SearchLimit:
+                pass
+            search_rate = ip.succs / (timer() - start)
+
+            problem.index.clear()
+            start = timer()
+            for state in ip.expanded:
+                problem.actions(state)
+            actions_rate = len(ip.expanded) / (timer() - start)
+            print("{:<10}{:>9}{:>12}{:>8}{:>16.0f}{:>16.0f}".format(
+                name, len(problem.actions_list), ip.succs, "yes" if use_index else "no",
+                search_rate, actions_rate))
+
+
+def run_limited(problem, search_function, heuristic, limit):
+    """ Run one search of `problem`, stopped after `limit` expansions.
+
+    :return: (LimitedProblem, Node or None, float)
+        the counters of the search, the solution node (None if the search
+        failed or was stopped) and the seconds it took
+    """
+    ip = LimitedProblem(problem, limit)
+    h = getattr(problem, heuristic) if heuristic else None
+    start = timer()
+    try:
+        node = search_function(ip, h) if h is not None else search_function(ip)
+    except SearchLimit:
+        node = None
+    elapsed = timer() - start
+    if not isinstance(node, Node):
+        # depth_limited_search returns 'cutoff'
+        node = None
+    return ip, node, elapsed
+
+
+def bench_sweep(args):
+    """Solve air_cargo_p1..p3 and generated instances of every size of
+    `--sizes` with every search of `--searches` (indices into
+    run_search.SEARCHES), and write the time, expansions, goal tests, new
+    nodes and peak memory of each search to the CSV file `--output`.
+
+    Each search runs twice: once timed, and once under tracemalloc for the
+    peak memory, which would otherwise slow down the timed run. Searches
+    that reach `--expansions` are stopped and recorded as unsolved; the
+    heuristic caches are cleared before every run. """
+    import csv
+    import tracemalloc
+
+    searches = [SEARCHES[i - 1] for i in args.searches]
+    fields = ["problem", "cargos", "planes", "airports", "seed", "actions", "search",
+              "heuristic", "solved", "plan_length", "expansions", "goal_tests",
+              "new_nodes", "seconds", "peak_kib"]
+    with open(args.output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for name, seed, problem in problems(args, args.compiled):
+            for search_name, search_function, heuristic in searches:
+                clear_heuristic_caches()
+                ip, node, elapsed = run_limited(problem, search_function, heuristic,
+                                                args.expansions)
+                clear_heuristic_caches()
+                tracemalloc.start()
+                run_limited(problem, search_function, heuristic, args.expansions)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                row = [name, len(problem.cargos), len(problem.planes),
+                       len(problem.airports), seed if seed is not None else "",
+                       len(problem.actions_list), search_name, heuristic,
+                       node is not None, len(node.solution()) if node is not None else "",
+                       ip.succs, ip.goal_tests, ip.states, round(elapsed, 4),
+                       round(peak / 1024.)]
+                writer.writerow(row)
+                f.flush()
+                print("{:<10}{:<32}{:<24}{}".format(name, search_name, heuristic,
+                                                    ip if node is not None else
+                                                    "{} (stopped)".format(ip)))
+
+
+BENCHMARKS = {
+    "actions": bench_actions,
+    "sweep": bench_sweep,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run air cargo planning benchmarks.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help="The benchmark to run.")
+    parser.add_argument("--expansions", type=int, default=20000,
+                        help="Expansions after which a benchmark search stops.")
+    parser.add_argument("--sizes", type=parse_size, nargs="*",
+                        default=[(6, 3, 6), (10, 4, 10)],
+                        help="Sizes (CARGOSxPLANESxAIRPORTS) of the generated instances.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the generated instances.")
+    parser.add_argument("--searches", type=int, nargs="+", default=[1, 5, 7, 8, 9],
+                        choices=range(1, len(SEARCHES) + 1), metavar="",
+                        help="Indices of the run_search.py searches of the sweep.")
+    parser.add_argument("--compiled", action="store_true",
+                        help="Sweep the compiled problems.")
+    parser.add_argument("--output", default="sweep.csv",
+                        help="CSV file written by the sweep.")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
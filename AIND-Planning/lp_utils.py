@@ -66,3 +66,107 @@ def decode_state(state: str, fluent_map: list) -> FluentState:
         else:
             fs.neg.append(fluent_map[idx])
     return fs
+
+
+def state_to_bits(state: str) -> int:
+    """ convert a string of T/F to an integer bitset
+
+    The first fluent is the most significant bit, so that integer states
+    compare like their T/F strings.
+
+    :param state: str eg. "TFFTFT" string of mapped positive and negative fluents
+    :return: int with bit len(state) - 1 - i set when fluent i is true
+    """
+    return int(state.replace('T', '1').replace('F', '0'), 2)
+
+
+def bits_to_state(bits: int, num_fluents: int) -> str:
+    """ convert an integer bitset to a string of T/F
+
+    :param bits: int with bit num_fluents - 1 - i set when fluent i is true
+    :param num_fluents: number of fluents in the mapping
+    :return: str eg. "TFFTFT" string of mapped positive and negative fluents
+    """
+    return format(bits, '0{}b'.format(num_fluents)).replace('1', 'T').replace('0', 'F')
+
+
+class PreconditionIndex():
+    """ index from each fluent to the actions whose preconditions mention it,
+    which finds the applicable actions of a state by counting satisfied
+    preconditions instead of testing every action
+
+    Fluents are bits of integer states (see state_to_bits). The index keeps
+    the count of unsatisfied preconditions of every action in the last state
+    it was given, and update() moves to a new state by visiting only the
+    actions of the fluents that changed, so consecutive states that differ
+    by the effects of one action cost a few count updates.
+    """
+
+    def __init__(self, preconds: list, num_fluents: int):
+        """
+        :param preconds: list of (int, int)
+            positive and negative precondition masks of each action
+        :param num_fluents: number of fluents (bits) of the states
+        """
+        self.pos_actions = [[] for _ in range(num_fluents)]
+        self.neg_actions = [[] for _ in range(num_fluents)]
+        self.num_pos = []
+        for idx, (pos, neg) in enumerate(preconds):
+            self.num_pos.append(bin(pos).count("1"))
+            for bit in range(num_fluents):
+                if pos >> bit & 1:
+                    self.pos_actions[bit].append(idx)
+                if neg >> bit & 1:
+                    self.neg_actions[bit].append(idx)
+        self.clear()
+
+    def clear(self):
+        """ reset the counts to the state with no true fluents
+        """
+        self.state = 0
+        self.unsatisfied = list(self.num_pos)
+        self.applicable = {idx for idx, count in enumerate(self.num_pos) if not count}
+
+    def update(self, state: int):
+        """ update the counts and applicable actions to `state`
+
+        :param state: int bitset of true fluents
+        """
+        changed = state ^ self.state
+        if bin(changed).count("1") > bin(state).count("1"):
+            # cheaper to rebuild from the empty state
+            self.clear()
+            changed = state
+        unsatisfied = self.unsatisfied
+        applicable = self.applicable
+        while changed:
+            low = changed & -changed
+            bit = low.bit_length() - 1
+            changed ^= low
+            # a fluent becoming true satisfies the positive preconditions on
+            # it and breaks the negative ones, and the reverse when it
+            # becomes false
+            if state & low:
+                satisfied, broken = self.pos_actions[bit], self.neg_actions[bit]
+            else:
+                satisfied, broken = self.neg_actions[bit], self.pos_actions[bit]
+            for idx in satisfied:
+                count = unsatisfied[idx] - 1
+                unsatisfied[idx] = count
+                if not count:
+                    applicable.add(idx)
+            for idx in broken:
+                if not unsatisfied[idx]:
+                    applicable.discard(idx)
+                unsatisfied[idx] += 1
+        self.state = state
+
+    def actions(self, state: int) -> list:
+        """ return the indices of the actions applicable in `state`, in
+        increasing order
+
+        :param state: int bitset of true fluents
+        :return: list of int
+        """
+        self.update(state)
+        return sorted(self.applicable)
@@ -5,10 +5,12 @@ from aimacode.search import (
 )
 from aimacode.utils import expr
 from lp_utils import (
-    FluentState, encode_state, decode_state,
+    FluentState, PreconditionIndex, encode_state, decode_state, state_to_bits,
+    bits_to_state,
 )
 from my_planning_graph import PlanningGraph
 
+import random
 from functools import lru_cache
 
 
@@ -225,7 +227,138 @@ class AirCargoProblem(Problem):
 
 
 
-def air_cargo_p1() -> AirCargoProblem:
+# Number of actions from which CompiledAirCargoProblem finds the applicable
+# actions with a precondition index (see benchmark.py actions)
+INDEX_MIN_ACTIONS = 128
+
+
+class CompiledAirCargoProblem(AirCargoProblem):
+    """ AirCargoProblem over integer states, with one bit per fluent of
+    `state_map`. The first fluent is the most significant bit, so that
+    integer states sort like their T/F strings and the searches break ties
+    between nodes the same way on both representations. Each action is compiled to masks of its
+    positive and negative preconditions and of the fluents it adds and
+    deletes, so that the applicable actions, successors and goal test are
+    bitwise operations instead of knowledge base queries.
+
+    Problems with at least INDEX_MIN_ACTIONS actions find the applicable
+    actions with a PreconditionIndex, which only visits the actions that
+    need the fluents changed since the last state, instead of testing the
+    preconditions of every action (set `use_index` to override). On smaller
+    problems testing every action with the masks is faster.
+
+    States returned to the searches are ints; `encode` and `decode` convert
+    them from and to the T/F strings of AirCargoProblem.
+    """
+
+    def __init__(self, cargos, planes, airports, initial: FluentState, goal: list):
+        """
+
+        :param cargos: list of str
+            cargos in the problem
+        :param planes: list of str
+            planes in the problem
+        :param airports: list of str
+            airports in the problem
+        :param initial: FluentState object
+            positive and negative literal fluents (as expr) describing initial state
+        :param goal: list of expr
+            literal fluents required for goal test
+        """
+        AirCargoProblem.__init__(self, cargos, planes, airports, initial, goal)
+        last = len(self.state_map) - 1
+        self.fluent_bit = {fluent: last - idx for idx, fluent in enumerate(self.state_map)}
+        self.initial = self.encode(self.initial_state_TF)
+        self.goal_mask = self.mask(goal)
+        # (precond_pos, precond_neg, effect_add, effect_rem) masks of each action
+        self.action_masks = {}
+        for action in self.actions_list:
+            self.action_masks[action] = (
+                self.mask(action.precond_pos), self.mask(action.precond_neg),
+                self.mask(action.effect_add), self.mask(action.effect_rem))
+        self._preconds = [(action, masks[0], masks[1])
+                          for action, masks in self.action_masks.items()]
+        self.index = PreconditionIndex([(pos, neg) for _, pos, neg in self._preconds],
+                                       len(self.state_map))
+        self.use_index = len(self.actions_list) >= INDEX_MIN_ACTIONS
+
+    def mask(self, fluents: list) -> int:
+        """ Return the bitset of a list of fluents
+
+        :param fluents: list of expr
+        :return: int
+        """
+        bits = 0
+        for fluent in fluents:
+            bits |= 1 << self.fluent_bit[fluent]
+        return bits
+
+    def encode(self, state: str) -> int:
+        """ Convert a T/F string state to an integer state
+
+        :param state: str
+        :return: int
+        """
+        return state_to_bits(state)
+
+    def decode(self, state: int) -> str:
+        """ Convert an integer state to a T/F string state
+
+        :param state: int
+        :return: str
+        """
+        return bits_to_state(state, len(self.state_map))
+
+    def actions(self, state: int) -> list:
+        """ Return the actions that can be executed in the given state.
+
+        :param state: int
+            state represented as a bitset of mapped fluents
+        :return: list of Action objects
+        """
+        if self.use_index:
+            actions_list = self.actions_list
+            return [actions_list[idx] for idx in self.index.actions(state)]
+        return [action for action, pos, neg in self._preconds
+                if state & pos == pos and not state & neg]
+
+    def result(self, state: int, action: Action):
+        """ Return the state that results from executing the given
+        action in the given state. The action must be one of
+        self.actions(state).
+
+        :param state: state entering node
+        :param action: Action applied
+        :return: resulting state after action
+        """
+        _, _, add, rem = self.action_masks[action]
+        return (state & ~rem) | add
+
+    def goal_test(self, state: int) -> bool:
+        """ Test the state to see if goal is reached
+
+        :param state: int representing state
+        :return: bool
+        """
+        return state & self.goal_mask == self.goal_mask
+
+    @lru_cache(maxsize=8192)
+    def h_pg_levelsum(self, node: Node):
+        """Level sum heuristic of AirCargoProblem, computed on the planning
+        graph of the decoded state.
+        """
+        pg = PlanningGraph(self, self.decode(node.state))
+        return pg.h_levelsum()
+
+    @lru_cache(maxsize=8192)
+    def h_ignore_preconditions(self, node: Node):
+        """Ignore preconditions heuristic of AirCargoProblem: the number of
+        goal fluents that do not hold in the state.
+        """
+        return bin(self.goal_mask & ~node.state).count("1")
+
+
+def air_cargo_p1(compiled=False) -> AirCargoProblem:
     cargos = ['C1', 'C2']
     planes = ['P1', 'P2']
     airports = ['JFK', 'SFO']
@@ -247,10 +380,11 @@ def air_cargo_p1() -> AirCargoProblem:
     goal = [expr('At(C1, JFK)'),
             expr('At(C2, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    problem_cls = CompiledAirCargoProblem if compiled else AirCargoProblem
+    return problem_cls(cargos, planes, airports, init, goal)
 
 
-def air_cargo_p2() -> AirCargoProblem:
+def air_cargo_p2(compiled=False) -> AirCargoProblem:
     cargos = ['C1', 'C2', 'C3']
     planes = ['P1', 'P2','P3']
     airports = ['JFK', 'SFO', 'ATL']
@@ -288,10 +422,11 @@ def air_cargo_p2() -> AirCargoProblem:
             expr('At(C2, SFO)'),
             expr('At(C3, SFO)'),
             ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    problem_cls = CompiledAirCargoProblem if compiled else AirCargoProblem
+    return problem_cls(cargos, planes, airports, init, goal)
 
 
-def air_cargo_p3() -> AirCargoProblem:
+def air_cargo_p3(compiled=False) -> AirCargoProblem:
     cargos = ['C1', 'C2', 'C3', 'C4']
     planes = ['P1', 'P2']
     airports = ['JFK', 'SFO', 'ATL', 'ORD']
@@ -338,4 +473,46 @@ def air_cargo_p3() -> AirCargoProblem:
         expr('At(C2, SFO)'),
         expr('At(C4, SFO)')
     ]
-    return AirCargoProblem(cargos, planes, airports, init, goal)
+    problem_cls = CompiledAirCargoProblem if compiled else AirCargoProblem
+    return problem_cls(cargos, planes, airports, init, goal)
+
+
+def air_cargo_instance(num_cargos, num_planes, num_airports, seed=0,
+                       compiled=False) -> AirCargoProblem:
+    """Generate an air cargo problem of the given size. Cargos C1.., planes
+    P1.. and airports A1.. start at airports drawn from a random generator
+    seeded with `seed`, and every cargo has to reach another airport.
+
+    :param num_cargos: int
+    :param num_planes: int
+    :param num_airports: int, at least 2
+    :param seed: seed of the random generator
+    :param compiled: if True, return a CompiledAirCargoProblem
+    :return: AirCargoProblem
+    """
+    if num_airports < 2:
+        raise ValueError("An air cargo problem needs at least two airports.")
+    rng = random.Random(seed)
+    cargos = ['C{}'.format(i) for i in range(1, num_cargos + 1)]
+    planes = ['P{}'.format(i) for i in range(1, num_planes + 1)]
+    airports = ['A{}'.format(i) for i in range(1, num_airports + 1)]
+    pos = []
+    neg = []
+    goal = []
+    for cargo in cargos:
+        start = rng.choice(airports)
+        for airport in airports:
+            fluent = expr('At({}, {})'.format(cargo, airport))
+            (pos if airport == start else neg).append(fluent)
+        for plane in planes:
+            neg.append(expr('In({}, {})'.format(cargo, plane)))
+        destination = rng.choice([airport for airport in airports if airport != start])
+        goal.append(expr('At({}, {})'.format(cargo, destination)))
+    for plane in planes:
+        start = rng.choice(airports)
+        for airport in airports:
+            fluent = expr('At({}, {})'.format(plane, airport))
+            (pos if airport == start else neg).append(fluent)
+    init = FluentState(pos, neg)
+    problem_cls = CompiledAirCargoProblem if compiled else AirCargoProblem
+    return problem_cls(cargos, planes, airports, init, goal)
@@ -85,7 +85,7 @@ def manual():
                                                " ".join(s_choices)))
 
 
-def main(p_choices, s_choices):
+def main(p_choices, s_choices, compiled=False):
 
     problems = [PROBLEMS[i-1] for i in map(int, p_choices)]
     searches = [SEARCHES[i-1] for i in map(int, s_choices)]
@@ -96,7 +96,7 @@ def main(p_choices, s_choices):
             hstring = h if not h else " with {}".format(h)
             print("\nSolving {} using {}{}...".format(pname, sname, hstring))
 
-            _p = p()
+            _p = p(compiled)
             _h = None if not h else getattr(_p, h)
             run_search(_p, s, _h)
 
@@ -114,6 +114,8 @@ if __name__=="__main__":
                         help="Interactively select the problems and searches to run.")
     parser.add_argument('-p', '--problems', nargs="+", choices=range(1, len(PROBLEMS)+1), type=int, metavar='',
                         help="Specify the indices of the problems to solve as a list of space separated values. Choose from: {!s}".format(list(range(1, len(PROBLEMS)+1))))
+    parser.add_argument('-c', '--compiled', action="store_true",
+                        help="Search the compiled problems, with states stored as integer bitsets.")
     parser.add_argument('-s', '--searches', nargs="+", choices=range(1, len(SEARCHES)+1), type=int, metavar='',
                         help="Specify the indices of the search algorithms to use as a list of space separated values. Choose from: {!s}".format(list(range(1, len(SEARCHES)+1))))
     args = parser.parse_args()
@@ -121,7 +123,8 @@ if __name__=="__main__":
     if args.manual:
         manual()
     elif args.problems and args.searches:
-        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))))
+        main(list(sorted(set(args.problems))), list(sorted(set((args.searches)))),
+             args.compiled)
     else:
         print()
         parser.print_help()
@@ -4,11 +4,12 @@ parent = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(os.path.dirname(parent), "aimacode"))
 from aimacode.planning import Action
 from aimacode.utils import expr
-from aimacode.search import Node
+from aimacode.search import Node, InstrumentedProblem, astar_search, breadth_first_search
+import random
 import unittest
-from lp_utils import decode_state
+from lp_utils import PreconditionIndex, decode_state
 from my_air_cargo_problems import (
-    air_cargo_p1, air_cargo_p2, air_cargo_p3,
+    air_cargo_instance, air_cargo_p1, air_cargo_p2, air_cargo_p3,
 )
 
 class TestAirCargoProb1(unittest.TestCase):
@@ -80,5 +81,82 @@ class TestAirCargoMethods(unittest.TestCase):
         n = Node(self.p1.initial)
         self.assertEqual(self.p1.h_ignore_preconditions(n),2)
 
+class TestCompiledAirCargo(unittest.TestCase):
+
+    def setUp(self):
+        self.p1 = air_cargo_p1()
+        self.c1 = air_cargo_p1(compiled=True)
+
+    def test_compiled_initial_state(self):
+        self.assertIsInstance(self.c1.initial, int)
+        self.assertEqual(self.c1.decode(self.c1.initial), self.p1.initial)
+        self.assertEqual(self.c1.encode(self.p1.initial), self.c1.initial)
+
+    def test_compiled_actions_and_result(self):
+        actions = self.c1.actions(self.c1.initial)
+        self.assertEqual([str(a) for a in actions],
+                         [str(a) for a in self.p1.actions(self.p1.initial)])
+        for action in actions:
+            self.assertEqual(self.c1.decode(self.c1.result(self.c1.initial, action)),
+                             self.p1.result(self.p1.initial, action))
+
+    def test_compiled_goal_test_and_heuristic(self):
+        self.assertFalse(self.c1.goal_test(self.c1.initial))
+        self.assertEqual(self.c1.h_ignore_preconditions(Node(self.c1.initial)), 2)
+
+    def test_compiled_search_matches(self):
+        stats = []
+        for problem in (self.p1, self.c1):
+            ip = InstrumentedProblem(problem)
+            node = breadth_first_search(ip)
+            stats.append((ip.succs, ip.goal_tests, ip.states,
+                          [str(a) for a in node.solution()]))
+        self.assertEqual(stats[0], stats[1])
+
+    def test_precondition_index_matches_scan(self):
+        c2 = air_cargo_p2(compiled=True)
+        walks = []
+        for use_index in (False, True):
+            c2.use_index = use_index
+            rng = random.Random(0)
+            state = c2.initial
+            applicable = []
+            for _ in range(50):
+                applicable.append(c2.actions(state))
+                state = c2.result(state, rng.choice(applicable[-1]))
+            walks.append(applicable)
+        self.assertEqual(walks[0], walks[1])
+
+    def test_precondition_index_negative_preconditions(self):
+        # action 0 needs fluent bit 0 and not bit 1, action 1 needs bit 1
+        index = PreconditionIndex([(0b01, 0b10), (0b10, 0)], 2)
+        self.assertEqual(index.actions(0b00), [])
+        self.assertEqual(index.actions(0b01), [0])
+        self.assertEqual(index.actions(0b11), [1])
+        self.assertEqual(index.actions(0b10), [1])
+        self.assertEqual(index.actions(0b01), [0])
+
+
+class TestAirCargoInstance(unittest.TestCase):
+
+    def test_instance_size(self):
+        p = air_cargo_instance(3, 2, 4, seed=1)
+        self.assertEqual(len(p.initial), 3 * (4 + 2) + 2 * 4)
+        self.assertEqual(len(p.actions_list), 2 * 3 * 2 * 4 + 2 * 4 * 3)
+        self.assertEqual(len(p.goal), 3)
+
+    def test_instance_is_seeded(self):
+        p = air_cargo_instance(3, 2, 4, seed=1)
+        self.assertEqual(p.initial, air_cargo_instance(3, 2, 4, seed=1).initial)
+        self.assertEqual(p.goal, air_cargo_instance(3, 2, 4, seed=1).goal)
+        self.assertFalse(p.goal_test(p.initial))
+
+    def test_instance_is_solvable(self):
+        p = air_cargo_instance(3, 2, 3, seed=2, compiled=True)
+        node = astar_search(p, p.h_ignore_preconditions)
+        self.assertTrue(p.goal_test(node.state))
+        self.assertRaises(ValueError, air_cargo_instance, 2, 2, 1)
+
+
 if __name__ == '__main__':
     unittest.main()